@@ -1,53 +1,20 @@
-import pathlib
+import json, logging, os, pathlib, time
+from concurrent.futures import ProcessPoolExecutor
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas
 
-def backtest(ticker, csv_path, balance_allocated, term, risk_control):
-
-    def findATR(): # Average True Range
-        df["Prev. Close"] = df["Close"].shift(1)
-        df["TR"] = df[["High", "Low", "Prev. Close"]].apply(
-            lambda row: max(
-                row["High"] - row["Low"],
-                abs(row["High"] - row["Prev. Close"]),
-                abs(row["Low"] - row["Prev. Close"])
-            ),
-            axis=1
-        )
-        df["ATR"] = df["TR"].rolling(14).mean()
-
-    def findSA(): # Slippage Adjustment
-        df["Prop. Range"] = (df["High"] - df["Low"]) / df["Close"]
-        df["Avg. Volume"] = df["Volume"].rolling(30).mean()
-        df.loc[df.index[:29], "Avg. Volume"] = 1 #placeholder; day 1-29 are not included in analysis anyway
-        df["Norm. Volume"] =  df[["Volume", "Avg. Volume"]].apply(
-            lambda row: max(0.001, row["Volume"] / row["Avg. Volume"]), axis=1)
-            # Limiting lower bound to 0.001 avoids division by 0, or unusual cases where
-            # volume is 0 but somehow high and low are not.
-
-        control_bias = 0.1
-        df["SA"] = df[["Prop. Range", "Norm. Volume"]].apply(
-            lambda row: control_bias * row["Prop. Range"] / row["Norm. Volume"] / 100, axis=1)
-        df["SA"] = df["SA"].apply(lambda sa: max(0.0005, min(sa, 0.05)))
-
-    # Get all data needed
-    df = pandas.read_csv(csv_path, parse_dates=["Date"], index_col="Date")
-    df = df[~df.index.duplicated(keep='first')]
-    if term.upper() == "SHORT":
-        short, long = 20, 50
-    else: short, long = 50, 200
-    shortSMA_label = f"SMA {short}"
-    longSMA_label = f"SMA {long}"
-    df[shortSMA_label] = df["Close"].rolling(short).mean()
-    df[longSMA_label] = df["Close"].rolling(long).mean()
-    if risk_control: findATR()
-    findSA()
-    df = df[long:]
+import indicators, result_cache
+from storage import load_prices, stored_tickers
 
-    # Simulate buying and selling stocks with 1-cent fee per share bought and slippage
+logger = logging.getLogger("backtester")
+
+# Both engines take the prepared DataFrame (SMA, SA and, if risk-controlled, ATR columns
+# already computed and sliced) and return (final balance, list of (buy date, sell date)).
+
+def simulate_reference(df, shortSMA_label, longSMA_label, balance_allocated, risk_control):
+    # Original day-by-day loop. Slow, but kept as the reference the vectorized engine is checked against.
     dynamic_balance = balance_allocated   # apply every win/loss to dynamic_balance and work with it
-    highest_win = highest_loss = 0   # keep track of best win and worst loss
     yesterday = df.index[0]
     buyDate, matchDate = None, []
     for today in df.index[1:]:
@@ -74,96 +41,305 @@ def backtest(ticker, csv_path, balance_allocated, term, risk_control):
 
         yesterday = today
 
+    return dynamic_balance, matchDate
+
+def crossovers(shortSMA, longSMA):
+    # Days where the short SMA crosses above / below the long SMA, from today vs. yesterday.
+    # Works on 1D arrays, or on 2D arrays with one row per window pair (days on the last axis).
+    # Day 0 has no yesterday, so it is never a signal day.
+    crossUp = np.zeros(shortSMA.shape, dtype=bool)
+    crossDown = np.zeros(shortSMA.shape, dtype=bool)
+    crossUp[..., 1:] = (shortSMA[..., 1:] >= longSMA[..., 1:]) & (shortSMA[..., :-1] <= longSMA[..., :-1])
+    crossDown[..., 1:] = (shortSMA[..., 1:] <= longSMA[..., 1:]) & (shortSMA[..., :-1] >= longSMA[..., :-1])
+    return crossUp, crossDown
+
+def simulate_signals(close, sa, atr, crossUp, crossDown, balance_allocated, risk_control, start=0):
+    # Trade on precomputed signal days, looping only over the days where something can actually happen.
+    # Nothing is bought on or before day `start`. Returns (final balance, list of (buy day, sell day) indices).
+    upDays = np.flatnonzero(crossUp)
+    downDays = np.flatnonzero(crossDown)
+    days = len(close)
+
+    dynamic_balance = balance_allocated
+    trades = []
+    lastSell = start   # we can only buy strictly after the day we last sold
+    while True:
+
+        # Buy at the first upward crossover we can afford at least one share on.
+        # The balance only changes on sells, so skipping unaffordable days here is safe.
+        buy = None
+        for day in upDays[np.searchsorted(upDays, lastSell, side="right"):]:
+            buyPrice = close[day] * (1 + sa[day]) + 0.01
+            buyVolume = dynamic_balance // buyPrice
+            if buyVolume != 0:
+                buy = day
+                break
+        if buy is None:
+            break
+
+        # Sell at the next downward crossover, or earlier if the ATR stop is hit first.
+        nextDown = np.searchsorted(downDays, buy, side="right")
+        sell = downDays[nextDown] if nextDown < len(downDays) else days
+        if risk_control:
+            stopped = np.flatnonzero(close[buy + 1:sell] <= (close[buy] - (2 * atr[buy + 1:sell])))
+            if len(stopped):
+                sell = buy + 1 + stopped[0]
+        if sell == days: # still holding when the data ends; the open position is not counted
+            break
+
+        trades.append((buy, sell))
+        sellPrice = close[sell] * (1 - sa[sell])
+        dynamic_balance += (sellPrice - buyPrice) * buyVolume
+        lastSell = sell
+
+    return dynamic_balance, trades
+
+def simulate_vectorized(df, shortSMA_label, longSMA_label, balance_allocated, risk_control):
+    # Same rules as simulate_reference, but on whole NumPy arrays.
+    crossUp, crossDown = crossovers(df[shortSMA_label].to_numpy(), df[longSMA_label].to_numpy())
+    atr = df["ATR"].to_numpy() if risk_control else None
+    dynamic_balance, trades = simulate_signals(
+        df["Close"].to_numpy(), df["SA"].to_numpy(), atr, crossUp, crossDown, balance_allocated, risk_control)
+    return dynamic_balance, [(df.index[buy], df.index[sell]) for buy, sell in trades]
+
+ENGINES = {
+    "vectorized": simulate_vectorized,
+    "reference": simulate_reference
+}
+
+def term_windows(term):
+    # (short, long) SMA windows of a term
+    if term.upper() == "SHORT":
+        return 20, 50
+    return 50, 200
+
+def summarize(df, matchDate, dynamic_balance, balance_allocated, term, risk_control):
+    # The stats of a finished simulation.
+    # Best win and worst loss, measured on Close prices
+    highest_win = highest_loss = 0
+    if matchDate:
+        buy_prices = df["Close"].loc[pandas.DatetimeIndex([buy for buy, _ in matchDate])].to_numpy()
+        sell_prices = df["Close"].loc[pandas.DatetimeIndex([sell for _, sell in matchDate])].to_numpy()
+        net_change_percents = ((sell_prices - buy_prices) / buy_prices) * 100
+        net_change_percents = net_change_percents[~np.isnan(net_change_percents)]
+        if len(net_change_percents):
+            highest_win = max(highest_win, net_change_percents.max())
+            highest_loss = min(highest_loss, net_change_percents.min())
+
+    net_change_total = (dynamic_balance / balance_allocated - 1) * 100
+    return {
+        "term": term,
+        "risk-control": risk_control,
+        "balance-allocated": balance_allocated,
+        "final-balance": dynamic_balance,
+        "net-change": net_change_total,
+        "highest-win": highest_win,
+        "highest-loss": highest_loss
+    }
+
+def run_backtest(data_path, balance_allocated, term, risk_control, engine="vectorized", timings=False, use_cache=True, with_chart=True):
+    # The whole backtest minus the chart: touches no GUI state, so it is safe to run on a worker thread.
+    # Returns (stats, chart), where chart holds what plot_backtest needs.
+    # With timings=True, stats gets a "timings" section: seconds per phase and a few counters.
+    # An identical earlier run is read from the result cache (see result_cache.py) unless use_cache=False.
+    # With with_chart=False the chart may come back as None, which saves loading the prices on a cache hit
+    # and lets chunked data be backtested a chunk at a time.
+    if engine not in ENGINES:
+        raise Exception("INVALID ENGINE")
+
+    started = time.perf_counter()
+    key = result_cache.cache.key(data_path, balance_allocated, term, risk_control, engine) if use_cache else None
+    cached = result_cache.cache.get(key) if key else None
+    if cached and not with_chart:
+        stats, matchDate = cached
+        if timings:
+            stats["timings"] = {
+                "load": time.perf_counter() - started, "indicators": 0.0, "simulate": 0.0,
+                "rows-loaded": 0, "bars-simulated": 0, "trades": len(matchDate), "cached": True
+            }
+        return stats, None
+    if pathlib.Path(data_path).suffix == ".chunks" and not with_chart:
+        # Chunked (intraday) data: a chunk at a time through the streaming engine, which gives the same
+        # results as the engines below without ever holding the whole history in memory.
+        from streaming import file_bars, StreamingBacktest # streaming imports this module
+        stream = StreamingBacktest(balance_allocated, term, risk_control)
+        for bar in file_bars(data_path):
+            stream.update(*bar)
+        stats, matchDate = stream.stats(), stream.trades
+        if key:
+            result_cache.cache.put(key, stats, matchDate)
+        if timings:
+            stats["timings"] = {
+                "load": 0.0, "indicators": 0.0, "simulate": time.perf_counter() - started,
+                "rows-loaded": stream.bars, "bars-simulated": max(0, stream.bars - term_windows(term)[1]),
+                "trades": len(matchDate), "cached": False
+            }
+        return stats, None
+
+    # Get all data needed; a chart keeps its prices for as long as its window is open, so they aren't memory-mapped
+    df = load_prices(data_path, memory_map=not with_chart)
+    rows_loaded = len(df)
+    loaded = time.perf_counter()
+    short, long = term_windows(term)
+    shortSMA_label = f"SMA {short}"
+    longSMA_label = f"SMA {long}"
+    df[shortSMA_label] = indicators.cache.get(data_path, df, "sma", window=short)
+    df[longSMA_label] = indicators.cache.get(data_path, df, "sma", window=long)
+    if risk_control: df["ATR"] = indicators.cache.get(data_path, df, "atr")
+    df["SA"] = indicators.cache.get(data_path, df, "sa")
+    df = df[long:]
+    computed = time.perf_counter()
+
+    if cached: # only the chart was missing
+        stats, matchDate = cached
+    else:
+        # Simulate buying and selling stocks with 1-cent fee per share bought and slippage
+        dynamic_balance, matchDate = ENGINES[engine](df, shortSMA_label, longSMA_label, balance_allocated, risk_control)
+        stats = summarize(df, matchDate, dynamic_balance, balance_allocated, term, risk_control)
+        if key:
+            result_cache.cache.put(key, stats, matchDate)
+    if timings:
+        stats["timings"] = {
+            "load": loaded - started,
+            "indicators": computed - loaded,
+            "simulate": time.perf_counter() - computed,
+            "rows-loaded": rows_loaded,
+            "bars-simulated": len(df),
+            "trades": len(matchDate),
+            "cached": cached is not None
+        }
+    chart = {"prices": df, "short-label": shortSMA_label, "long-label": longSMA_label, "trades": matchDate}
+    return stats, chart
+
+def backtest(ticker, data_path, balance_allocated, term, risk_control, engine="vectorized", plot=True, timings=False, use_cache=True):
+    stats, chart = run_backtest(data_path, balance_allocated, term, risk_control, engine, timings, use_cache, with_chart=plot)
+    if plot:
+        started = time.perf_counter()
+        plot_backtest(ticker, term, risk_control, chart)
+        if timings:
+            stats["timings"]["plot"] = time.perf_counter() - started
+    return stats
+
+def log_timings(ticker, timings):
+    # One JSON object per line, for log collectors. Shows up once logging is configured at INFO level.
+    logger.info(json.dumps({"event": "backtest-timings", "ticker": ticker, **timings}))
+
+def plot_backtest(ticker, term, risk_control, chart, show=True):
+    # Must run on the main (GUI) thread. Returns the figure.
+    # pyplot is only imported here, so backtests that don't plot never load matplotlib.
+    import matplotlib.pyplot as plt
+    
+    df, matchDate = chart["prices"], chart["trades"]
+    shortSMA_label, longSMA_label = chart["short-label"], chart["long-label"]
+
     # Start plotting
-    plt.figure(figsize=(14, 7))
+    figure = plt.figure(figsize=(14, 7))
 
     # Price and SMA lines
     plt.plot(df.index, df["Close"], label="Close Price", color="black", linewidth=1)
     plt.plot(df.index, df[shortSMA_label], label=shortSMA_label, color="orange", linestyle="--")
     plt.plot(df.index, df[longSMA_label], label=longSMA_label, color="purple", linestyle="--")
 
-    # Buy/sell and win/loss labels
-    for buy, sell in matchDate:
-
-        # markers
-        buy_price, sell_price = df.loc[buy, "Close"], df.loc[sell, "Close"]
-        plt.scatter(buy, buy_price, marker="^", color="green", label="Buy")
-        plt.scatter(sell, sell_price, marker="^", color="red", label="Sell")
-
-        # win/loss label
-        net_change_percent = ((sell_price - buy_price) / buy_price) * 100
-        highest_win = max(highest_win, net_change_percent)
-        highest_loss = min(highest_loss, net_change_percent)
-        mid_date = buy + (sell - buy) / 2
-        mid_price = (buy_price + sell_price) / 2
-        label = f"{net_change_percent:+.2f}%"
-        plt.text(
-            mid_date,
-            mid_price,
-            label,
-            ha='center',
-            va='center',
-            fontsize=8,
-            color='white',
-            fontweight='bold',
-            bbox=dict(
-                boxstyle='round,pad=0.2',
-                facecolor='green' if net_change_percent >= 0 else 'red',
-                edgecolor='none',
-                alpha=0.6
-            )
-        )
+    if matchDate:
+        buys = pandas.DatetimeIndex([buy for buy, _ in matchDate])
+        sells = pandas.DatetimeIndex([sell for _, sell in matchDate])
+        buy_prices = df["Close"].loc[buys].to_numpy()
+        sell_prices = df["Close"].loc[sells].to_numpy()
 
-    # Buy/Sell labels in legend are duplicated. Must un-duplicate.
-    handles, labels = plt.gca().get_legend_handles_labels()
-    by_label = dict(zip(labels, handles)) # Dictionary entries must be unique
-    plt.legend(by_label.values(), by_label.keys()) # Dictionaries are ordered since Python v3.7
+        # Buy/sell markers: one scatter each, however many trades there are
+        plt.scatter(buys, buy_prices, marker="^", color="green", label="Buy")
+        plt.scatter(sells, sell_prices, marker="^", color="red", label="Sell")
+
+        # win/loss labels, halfway between each buy and its sell
+        net_change_percents = ((sell_prices - buy_prices) / buy_prices) * 100
+        mid_dates = buys + (sells - buys) / 2
+        mid_prices = (buy_prices + sell_prices) / 2
+        for mid_date, mid_price, net_change_percent in zip(mid_dates, mid_prices, net_change_percents):
+            plt.text(
+                mid_date,
+                mid_price,
+                f"{net_change_percent:+.2f}%",
+                ha='center',
+                va='center',
+                fontsize=8,
+                color='white',
+                fontweight='bold',
+                bbox=dict(
+                    boxstyle='round,pad=0.2',
+                    facecolor='green' if net_change_percent >= 0 else 'red',
+                    edgecolor='none',
+                    alpha=0.6
+                )
+            )
 
     # Polish graph
+    plt.legend()
     plt.title(f"{term.capitalize()}-Term SMA Crossover Strategy for {ticker} ({("RISK-CONTROLLED" if risk_control else "NO RISK CONTROL")})")
     plt.xlabel("Date")
     plt.ylabel("Price (USD)")
     plt.grid(True)
     plt.tight_layout()
-    plt.show(block=False)
+    if show:
+        plt.show(block=False)
+    return figure
 
-    net_change_total = (dynamic_balance / balance_allocated - 1) * 100
-    stats = {
-        "term": term,
-        "risk-control": risk_control,
-        "balance-allocated": balance_allocated,
-        "final-balance": dynamic_balance,
-        "net-change": net_change_total,
-        "highest-win": highest_win,
-        "highest-loss": highest_loss
-    }
+def backtest_worker(job):
+    # Runs in a pool process. Errors are returned, not raised, so one bad ticker doesn't sink the batch.
+    ticker, data_path, balance_allocated, term, risk_control, timings, use_cache = job
+    try:
+        if data_path is None:
+            raise Exception("NOT IN MEMORY")
+        stats = backtest(ticker, data_path, balance_allocated, term, risk_control, plot=False, timings=timings, use_cache=use_cache)
+        stats["error"] = None
+    except Exception as e:
+        stats = {"term": term, "risk-control": risk_control, "balance-allocated": balance_allocated, "error": str(e)}
+    stats["ticker"] = ticker
     return stats
 
-# FOR TESTING OUTSIDE OF TERMINAL.PY:
-# HOW-TO:
-# work-around for downloading .csv files manually:
-# run terminal.py and use ticker.add for the tickers you want to add
-# remove single quotes of block you want to test
+def backtest_batch(data_folder, balance_allocated, term, risk_control, tickers=None, workers=None, timings=False, use_cache=True):
+    # Backtest every stored ticker (or only the given tickers) without plotting,
+    # spread over a process pool. Returns one DataFrame with a row per ticker.
+    # With timings=True, the per-ticker timings become extra columns and are logged.
+    paths = stored_tickers(data_folder)
+    if tickers is None:
+        tickers = list(paths)
+    jobs = [(ticker.upper(), paths.get(ticker.upper()), balance_allocated, term, risk_control, timings, use_cache) for ticker in tickers]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        results = [backtest_worker(job) for job in jobs]
+    else:
+        # Small chunks of work per task keep the pickling overhead down without starving any worker.
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(backtest_worker, jobs, chunksize=chunksize))
+
+    columns = ["ticker", "term", "risk-control", "balance-allocated", "final-balance",
+               "net-change", "highest-win", "highest-loss", "error"]
+    if timings:
+        # Logged here in the parent: pool processes don't share its logging setup.
+        for stats in results:
+            if "timings" in stats:
+                log_timings(stats["ticker"], stats["timings"])
+                stats.update(stats.pop("timings"))
+        columns += ["load", "indicators", "simulate", "rows-loaded", "bars-simulated", "trades", "cached"]
+    return pandas.DataFrame(results, columns=columns).set_index("ticker")
+
+# FOR TESTING OUTSIDE OF MAIN.PY:
+# run main.py and add the tickers you want to test, then remove the single quotes of a block.
 # defaults: balance_allocated = $1000, term = long, risk_control = True
+# (guarded by __main__ because the batch runs on a process pool)
 
 # for testing short-term vs long-term.
 '''
-data_folder = pathlib.Path("Data")
-net_change_short = 0
-net_change_long = 0
-for file in data_folder.iterdir():
-    if file.name in ["tickerdata.json", "portfolio.json"]: continue
-    backtest(file.stem, pathlib.Path('Data') / file.name, 1000, "short", True)
-    backtest(file.stem, pathlib.Path('Data') / file.name, 1000, "long", True)
+if __name__ == "__main__":
+    print(backtest_batch("Data", 1000, "short", True))
+    print(backtest_batch("Data", 1000, "long", True))
 '''
 
 # for testing risk-control.
 '''
-data_folder = pathlib.Path("Data")
-net_change = 0
-net_change_controlled = 0
-for file in data_folder.iterdir():
-    if file.name in ["tickerdata.json", "portfolio.json"]: continue
-    backtest(file.stem, pathlib.Path('Data') / file.name, 1000, "long", False)
-    backtest(file.stem, pathlib.Path('Data') / file.name, 1000, "long", True)
-'''
\ No newline at end of file
+if __name__ == "__main__":
+    print(backtest_batch("Data", 1000, "long", False))
+    print(backtest_batch("Data", 1000, "long", True))
+'''
@@ -0,0 +1,151 @@
+# Benchmarks for the backtest pipeline on seeded synthetic data (no network, nothing in Data/ is touched).
+# Usage: python benchmark.py [--quick] [--output FILE]
+# Results are saved as JSON tagged with the current git commit, so runs on the same machine can be compared.
+import argparse, json, os, pathlib, platform, subprocess, sys, tempfile, time
+
+import matplotlib
+matplotlib.use("Agg") # render off-screen; must be chosen before pyplot is imported
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas
+
+import backtester, indicators, storage
+
+def synthetic_prices(bars, seed=0, freq="B", start="1970-01-01"):
+    # Geometric random walk with plausible High/Low/Open/Volume. Same seed, same data.
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, bars)))
+    high = close * (1 + np.abs(rng.normal(0, 0.01, bars)))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, bars)))
+    df = pandas.DataFrame({
+        "Close": close,
+        "High": high,
+        "Low": low,
+        "Open": (high + low) / 2,
+        "Volume": rng.integers(100_000, 5_000_000, bars).astype(np.float64)
+    }, index=pandas.date_range(start, periods=bars, freq=freq, name="Date"))
+    return df
+
+def cold_run(data_path, term, risk_control):
+    # A backtest that computes everything: no indicators from the in-process cache, no stored result.
+    indicators.cache.clear()
+    return backtester.run_backtest(data_path, 1000, term, risk_control, timings=True, use_cache=False)
+
+def best_timings(data_path, repeat, term="long", risk_control=True):
+    # Fastest of `repeat` cold runs for each phase (the least noisy estimate), plus one plot.
+    # "indicators-cached" is the indicators phase once they are cached, from one more (warm) run.
+    runs = [cold_run(data_path, term, risk_control) for _ in range(repeat)]
+    timings = {phase: min(stats["timings"][phase] for stats, _ in runs) for phase in ["load", "indicators", "simulate"]}
+    timings.update({key: runs[0][0]["timings"][key] for key in ["rows-loaded", "bars-simulated", "trades"]})
+    warm, _ = backtester.run_backtest(data_path, 1000, term, risk_control, timings=True, use_cache=False)
+    timings["indicators-cached"] = warm["timings"]["indicators"]
+
+    started = time.perf_counter()
+    backtester.plot_backtest("SYNTH", term, risk_control, runs[0][1])
+    plt.close("all")
+    timings["plot"] = time.perf_counter() - started
+
+    total = sum(timings[phase] for phase in ["load", "indicators", "simulate"])
+    timings["rows-per-second"] = timings["rows-loaded"] / total
+    return timings
+
+def bench_daily(folder, years, repeat):
+    results = []
+    for span in years:
+        df = synthetic_prices(252 * span, seed=span)
+        for storage_format in storage.FORMATS:
+            data_path = storage.price_path(folder, f"DAILY{span}", storage_format)
+            storage.ingest_prices(df, data_path)
+            results.append({"scenario": "daily", "years": span, "format": storage_format, **best_timings(data_path, repeat)})
+            print(results[-1], flush=True)
+    return results
+
+def bench_minute(folder, days, repeat):
+    # Continuous minute stamps: only the row count matters to the pipeline.
+    df = synthetic_prices(390 * days, seed=1, freq="min")
+    data_path = storage.price_path(folder, "MINUTE", "npy")
+    storage.ingest_prices(df, data_path)
+    result = {"scenario": "minute", "trading-days": days, "format": "npy", **best_timings(data_path, repeat, term="short")}
+    print(result, flush=True)
+    return [result]
+
+def bench_universe(folder, ticker_counts, workers):
+    results = []
+    for count in ticker_counts:
+        universe = pathlib.Path(folder) / f"universe{count}"
+        universe.mkdir()
+        for seed in range(count):
+            storage.ingest_prices(synthetic_prices(252 * 5, seed=seed), storage.price_path(universe, f"T{seed}", "npy"))
+
+        started = time.perf_counter()
+        table = backtester.backtest_batch(universe, 1000, "long", True, workers=workers)
+        seconds = time.perf_counter() - started
+        results.append({
+            "scenario": "universe", "tickers": count, "workers": workers or os.cpu_count(),
+            "seconds": seconds, "tickers-per-second": count / seconds, "errors": int(table["error"].notna().sum())
+        })
+        print(results[-1], flush=True)
+    return results
+
+def bench_startup(repeat):
+    # utils.init (what the window waits for) and utils.load_libraries (what the first download/backtest waits
+    # for, unless the background warm-up got there first) in a fresh interpreter, in an empty folder,
+    # so imports aren't already cached.
+    runs = []
+    code = f"import sys, time; sys.path.insert(0, {str(pathlib.Path(__file__).parent.resolve())!r}); " \
+           "started = time.perf_counter(); import utils; utils.init(); ready = time.perf_counter() - started; " \
+           "utils.load_libraries(); print(ready, utils.startup_timings['libraries'])"
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            output = subprocess.run([sys.executable, "-c", code], cwd=folder, capture_output=True, text=True, check=True)
+            runs.append([float(value) for value in output.stdout.strip().splitlines()[-1].split()])
+    result = {
+        "scenario": "startup", "best": min(run[0] for run in runs), "worst": max(run[0] for run in runs),
+        "libraries-best": min(run[1] for run in runs), "libraries-worst": max(run[1] for run in runs)
+    }
+    print(result, flush=True)
+    return [result]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=pathlib.Path(__file__).parent).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest pipeline on synthetic data")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast sanity check")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size for the universe runs")
+    parser.add_argument("--output", help="JSON file to write (default: benchmark-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        years, minute_days, ticker_counts = [5, 20], 20, [1, 10, 100]
+    else:
+        years, minute_days, ticker_counts = [5, 10, 20, 50], 252, [1, 10, 100, 1000, 5000]
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu-count": os.cpu_count(),
+        "profile": "quick" if args.quick else "full",
+        "results": []
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        report["results"] += bench_daily(folder, years, args.repeat)
+        report["results"] += bench_minute(folder, minute_days, args.repeat)
+        report["results"] += bench_universe(folder, ticker_counts, args.workers)
+    report["results"] += bench_startup(args.repeat)
+
+    output = pathlib.Path(args.output or f"benchmark-{commit}.json")
+    output.write_text(json.dumps(report, indent=2))
+    print(f"saved to {output}")
+
+if __name__ == "__main__":
+    main()
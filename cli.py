@@ -0,0 +1,154 @@
+# Headless entry point: no Tk window and no figures, results are printed as JSON or CSV.
+# Usage: python cli.py <command> [options]   (python cli.py -h for the list)
+# Run it from the project folder, like main.py, so it uses the same Data folder.
+import argparse, csv, json, logging, sys
+
+import matplotlib
+matplotlib.use("Agg") # non-interactive; must be chosen before anything imports pyplot
+
+import streaming, utils
+
+def output(result, fmt):
+    # result is a dict (one record) or a DataFrame (one row per ticker, or per ticker and setting)
+    if hasattr(result, "to_csv"):
+        if fmt == "csv":
+            result.to_csv(sys.stdout)
+        elif result.index.nlevels > 1: # several rows per ticker: a list of records
+            print(result.reset_index().to_json(orient="records", date_format="iso", indent=2))
+        else:
+            print(result.to_json(orient="index", date_format="iso", indent=2))
+    elif fmt == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(result.keys())
+        writer.writerow(result.values())
+    else:
+        print(json.dumps(result, indent=2, default=str))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stock Trading Algorithm (headless)")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--timings", action="store_true", help="log per-phase timings to stderr as JSON lines")
+    parser.add_argument("--no-cache", action="store_true", help="recompute backtests instead of reading earlier results")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="download and store tickers")
+    add.add_argument("tickers", nargs="+")
+    add.add_argument("--interval", choices=list(utils.INTERVALS), default="1d", help="bar size (default 1d)")
+    add.add_argument("--period", default=None, help="history to download, e.g. 5y or 60d (default: the longest available)")
+
+    remove = commands.add_parser("remove", help="remove a ticker (reverts its backtest on the portfolio)")
+    remove.add_argument("ticker")
+
+    commands.add_parser("refresh", help="fetch new bars for every stored ticker")
+
+    def backtest_options(command):
+        command.add_argument("--balance", type=float, default=1000, help="balance allocated (default 1000)")
+        command.add_argument("--term", choices=["short", "long"], default="long")
+        command.add_argument("--no-risk-control", dest="risk_control", action="store_false")
+
+    backtest = commands.add_parser("backtest", help="backtest one ticker and apply the result to the portfolio")
+    backtest.add_argument("ticker")
+    backtest_options(backtest)
+
+    batch = commands.add_parser("batch", help="backtest many tickers without touching the portfolio")
+    batch.add_argument("tickers", nargs="*", help="default: every stored ticker")
+    batch.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    backtest_options(batch)
+
+    shared = commands.add_parser("portfolio", help="trade stored daily tickers together from one shared balance")
+    shared.add_argument("tickers", nargs="*", help="default: every stored daily ticker")
+    shared.add_argument("--allocation", choices=["equal", "fraction"], default="equal",
+                        help="equal: 1/max-positions of the equity per position; fraction: --fraction of it (default equal)")
+    shared.add_argument("--max-positions", type=int, default=20, help="open positions at most, for equal allocation (default 20)")
+    shared.add_argument("--fraction", type=float, default=0.1, help="share of the equity per position (default 0.1)")
+    shared.add_argument("--equity", default=None, help="also write the daily equity curve to this CSV file")
+    backtest_options(shared)
+
+    walk = commands.add_parser("walkforward", help="pick SMA windows on a rolling training window, trade them on the next one")
+    walk.add_argument("ticker")
+    walk.add_argument("--balance", type=float, default=1000, help="balance allocated (default 1000)")
+    walk.add_argument("--train", type=int, default=504, help="training window in bars (default 504, about 2 years)")
+    walk.add_argument("--test", type=int, default=126, help="out-of-sample window in bars, and the step (default 126)")
+    walk.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    walk.add_argument("--folds", action="store_true", help="print every fold instead of the summary")
+
+    plugin = commands.add_parser("strategy", help="backtest a ticker with another signal (e.g. EMA crossover) without touching the portfolio")
+    plugin.add_argument("ticker")
+    plugin.add_argument("--strategy", choices=["sma", "ema"], default="ema", help="signal to trade on (default ema)")
+    backtest_options(plugin)
+
+    costs = commands.add_parser("montecarlo", help="re-price a ticker's backtest under random slippage and fee scenarios")
+    costs.add_argument("ticker")
+    costs.add_argument("--scenarios", type=int, default=10000, help="number of scenarios (default 10000)")
+    costs.add_argument("--seed", type=int, default=None, help="random seed, for repeatable results")
+    backtest_options(costs)
+
+    replay = commands.add_parser("replay", help="backtest a price file bar by bar, in constant memory (e.g. minute bars)")
+    replay.add_argument("file", help=".csv (Date, Close, High, Low, Open, Volume columns) or stored .npy file")
+    backtest_options(replay)
+
+    commands.add_parser("report", help="portfolio and stored tickers with their backtest results")
+
+    charts = commands.add_parser("charts", help="save a chart image per ticker and setting, plus an index.html")
+    charts.add_argument("tickers", nargs="*", help="default: every stored ticker")
+    charts.add_argument("--output", default="Reports", help="folder for the images (default: Reports)")
+    charts.add_argument("--image-format", choices=["png", "svg"], default="png")
+    charts.add_argument("--balance", type=float, default=1000, help="balance allocated (default 1000)")
+    charts.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+
+    args = parser.parse_args(argv)
+    if args.timings:
+        logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    utils.init()
+    utils.load_libraries() # the GUI defers these; every command here needs them anyway
+
+    try:
+        if args.command == "add":
+            result = utils.ticker_add_many(args.tickers, interval=args.interval, period=args.period)
+        elif args.command == "remove":
+            utils.ticker_remove(args.ticker)
+            result = {"removed": args.ticker.upper(), **utils.portfolio}
+        elif args.command == "refresh":
+            result = utils.ticker_refresh_all()
+        elif args.command == "backtest":
+            result = utils.ticker_backtest(args.ticker, args.balance, args.term, args.risk_control, plot=False,
+                                           timings=args.timings, use_cache=not args.no_cache)
+            if args.timings:
+                utils.log_timings(args.ticker.upper(), result["timings"])
+        elif args.command == "batch":
+            result = utils.ticker_backtest_batch(args.balance, args.term, args.risk_control, args.tickers or None,
+                                                 args.workers, args.timings, not args.no_cache)
+        elif args.command == "portfolio":
+            stats, equity, trades = utils.ticker_portfolio_backtest(
+                args.balance, args.term, args.risk_control, args.tickers or None,
+                args.allocation, args.max_positions, args.fraction
+            )
+            if args.equity:
+                equity.to_csv(args.equity)
+            result = stats
+        elif args.command == "walkforward":
+            stats, folds = utils.ticker_walk_forward(args.ticker, args.balance, args.train, args.test, workers=args.workers)
+            result = folds if args.folds else stats
+        elif args.command == "strategy":
+            result = utils.ticker_strategy_backtest(args.ticker, args.balance, args.term, args.risk_control,
+                                                    args.strategy, not args.no_cache)
+        elif args.command == "montecarlo":
+            result = utils.ticker_monte_carlo(args.ticker, args.balance, args.term, args.risk_control, args.scenarios, args.seed)
+        elif args.command == "replay":
+            stats, trades = streaming.stream_backtest(streaming.file_bars(args.file), args.balance, args.term, args.risk_control)
+            result = {**stats, "trades": len(trades)}
+        elif args.command == "charts":
+            results = utils.ticker_charts(args.output, args.balance, None, args.tickers or None, args.workers, args.image_format)
+            result = utils.pd.DataFrame(results).set_index(["ticker", "term", "risk-control"])
+        else:
+            result = utils.pd.DataFrame.from_dict(utils.tickerData, orient="index").rename_axis("ticker")
+            if args.format == "json":
+                result = {"portfolio": utils.portfolio, "tickers": utils.tickerData}
+        output(result, args.format)
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
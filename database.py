@@ -0,0 +1,94 @@
+import json, pathlib, sqlite3
+
+# Portfolio and ticker metadata in SQLite, one row per ticker, so a change rewrites one row instead
+# of a whole JSON file. Nothing here commits: callers group their changes in `with connection:`,
+# which commits them together or rolls them all back.
+
+# tickerData keys and their columns
+TICKER_FIELDS = {
+    "company-name": "company_name",
+    "backtested": "backtested",
+    "term": "term",
+    "risk-control": "risk_control",
+    "balance-allocated": "balance_allocated",
+    "final-balance": "final_balance",
+    "net-change": "net_change",
+    "highest-win": "highest_win",
+    "highest-loss": "highest_loss",
+    "interval": "interval"
+}
+BOOLEAN_FIELDS = ["backtested", "risk-control"]
+
+def connect(db_path):
+    # check_same_thread is off because the GUI opens the database on its start-up thread;
+    # after that, every write happens on the main thread.
+    connection = sqlite3.connect(db_path, check_same_thread=False)
+    with connection:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tickers (ticker TEXT PRIMARY KEY, company_name TEXT, backtested INTEGER, "
+            "term TEXT, risk_control INTEGER, balance_allocated REAL, final_balance REAL, net_change REAL, "
+            "highest_win REAL, highest_loss REAL, interval TEXT)"
+        )
+        # databases from before intraday support: their tickers are all daily
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(tickers)")]
+        if "interval" not in columns:
+            connection.execute("ALTER TABLE tickers ADD COLUMN interval TEXT DEFAULT '1d'")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS portfolio (id INTEGER PRIMARY KEY CHECK (id = 1), "
+            "balance REAL, initial_balance REAL, net REAL)"
+        )
+    return connection
+
+def load_tickers(connection):
+    columns = ", ".join(TICKER_FIELDS.values())
+    tickers = {}
+    for row in connection.execute(f"SELECT ticker, {columns} FROM tickers ORDER BY rowid"):
+        data = dict(zip(TICKER_FIELDS, row[1:]))
+        for field in BOOLEAN_FIELDS:
+            if data[field] is not None:
+                data[field] = bool(data[field])
+        tickers[row[0]] = data
+    return tickers
+
+def load_portfolio(connection):
+    row = connection.execute("SELECT balance, initial_balance, net FROM portfolio WHERE id = 1").fetchone()
+    if row is None:
+        return None
+    return {"balance": row[0], "initial-balance": row[1], "net": row[2]}
+
+def save_ticker(connection, ticker, data):
+    # Insert or update one ticker's row (the primary key keeps its original position).
+    columns = list(TICKER_FIELDS.values())
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+    connection.execute(
+        f"INSERT INTO tickers (ticker, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))}) "
+        f"ON CONFLICT(ticker) DO UPDATE SET {updates}",
+        [ticker] + [data[field] for field in TICKER_FIELDS]
+    )
+
+def delete_ticker(connection, ticker):
+    connection.execute("DELETE FROM tickers WHERE ticker = ?", (ticker,))
+
+def delete_all_tickers(connection):
+    connection.execute("DELETE FROM tickers")
+
+def save_portfolio(connection, portfolio):
+    connection.execute(
+        "INSERT INTO portfolio (id, balance, initial_balance, net) VALUES (1, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET balance = excluded.balance, initial_balance = excluded.initial_balance, net = excluded.net",
+        (portfolio["balance"], portfolio["initial-balance"], portfolio["net"])
+    )
+
+def migrate_json(connection, ticker_data_path, portfolio_path):
+    # One-shot import of the old tickerdata.json / portfolio.json, in a single transaction.
+    # The JSON files are renamed to *.migrated afterwards so they're never imported twice.
+    ticker_data_path, portfolio_path = pathlib.Path(ticker_data_path), pathlib.Path(portfolio_path)
+    with connection:
+        if ticker_data_path.exists():
+            for ticker, data in json.loads(ticker_data_path.read_text()).items():
+                save_ticker(connection, ticker, {"interval": "1d", **data})
+        if portfolio_path.exists():
+            save_portfolio(connection, json.loads(portfolio_path.read_text()))
+    for path in (ticker_data_path, portfolio_path):
+        if path.exists():
+            path.rename(path.with_name(path.name + ".migrated"))
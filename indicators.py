@@ -0,0 +1,185 @@
+import os, pathlib, shutil, threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas
+
+from storage import checksum, manifest_entry
+
+# Indicator columns, computed once per (price data, indicator, parameters) and then served from a cache.
+# Entries are keyed by a hash of the price file's content, so a ticker whose data changed (refresh,
+# re-adjustment, format conversion) can never get stale values: its old entries are dropped on sight.
+# Cached arrays are read-only; copy one before changing it.
+
+VERSION = 2 # part of every file name on disk: bump it when an indicator's formula changes
+
+_hashes = {} # path -> ((inode, mtime, size), hash)
+_hash_lock = threading.Lock()
+
+def content_hash(path):
+    # Hash of the file's bytes: the checksum in its manifest entry if it has a current one, otherwise computed
+    # and remembered while the file is unchanged on disk (save_prices always writes a new file, so the inode
+    # and mtime change with the content).
+    path = pathlib.Path(path)
+    entry = manifest_entry(path)
+    if entry:
+        return entry["checksum"]
+    info = path.stat()
+    signature = (info.st_ino, info.st_mtime_ns, info.st_size)
+    with _hash_lock:
+        known = _hashes.get(path)
+        if known and known[0] == signature:
+            return known[1]
+    digest = checksum(path)
+    with _hash_lock:
+        _hashes[path] = (signature, digest)
+    return digest
+
+def sma(df, window): # Simple Moving Average of Close
+    return df["Close"].rolling(window).mean().to_numpy()
+
+def atr(df, window=14): # Average True Range
+    prev_close = df["Close"].shift(1)
+    high_low = (df["High"] - df["Low"]).to_numpy()
+    # Like max(High - Low, |High - Prev. Close|, |Low - Prev. Close|): a missing High - Low makes the TR
+    # missing, while a missing previous close (day 1) is skipped, so day 1's TR is just High - Low.
+    tr = np.where(
+        np.isnan(high_low), np.nan,
+        np.fmax(high_low, np.fmax((df["High"] - prev_close).abs().to_numpy(), (df["Low"] - prev_close).abs().to_numpy()))
+    )
+    return pandas.Series(tr).rolling(window).mean().to_numpy()
+
+def slippage_inputs(df, window=30):
+    # The day's proportional High-Low range and its volume relative to the `window`-day average.
+    prop_range = (df["High"] - df["Low"]) / df["Close"]
+    avg_volume = df["Volume"].rolling(window).mean().to_numpy().copy()
+    avg_volume[:window - 1] = 1 # placeholder; the first days are not included in analysis anyway
+    # Limiting lower bound to 0.001 avoids division by 0, or unusual cases where
+    # volume is 0 but somehow high and low are not.
+    with np.errstate(divide="ignore", invalid="ignore"): # 0 / 0 on zero-volume stretches is expected
+        norm_volume = np.fmax(df["Volume"].to_numpy() / avg_volume, 0.001)
+    return prop_range.to_numpy(), norm_volume
+
+def slippage(df, window=30, control_bias=0.1): # Slippage Adjustment
+    prop_range, norm_volume = slippage_inputs(df, window)
+    sa = control_bias * prop_range / norm_volume / 100
+    return np.fmax(np.minimum(sa, 0.05), 0.0005) # an undefined SA falls back to the 0.05% floor
+
+INDICATORS = {"sma": sma, "atr": atr, "sa": slippage}
+
+class IndicatorCache:
+    # In-process LRU, bounded by memory_budget bytes, in front of an optional folder of .npy files
+    # (one sub-folder per ticker). Safe to share between threads.
+
+    def __init__(self, memory_budget=64 * 2**20, folder=None):
+        self.memory_budget = memory_budget
+        self.folder = pathlib.Path(folder) if folder else None
+        self.entries = OrderedDict() # (data hash, name, params) -> array, least recently used first
+        self.size = 0
+        self.data_hashes = {} # data path -> hash its entries were computed from
+        self.hits = self.disk_hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, data_path, df, name, **params):
+        # The indicator `name` (see INDICATORS) of df, the prices loaded from data_path.
+        data_hash = self.check(data_path)
+        key = (data_hash, name, tuple(sorted(params.items())))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        values = self.load(data_path, key)
+        from_disk = values is not None
+        if not from_disk:
+            values = INDICATORS[name](df, **params)
+            values.flags.writeable = False
+            self.save(data_path, key, values)
+        with self.lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self.remember(key, values)
+        return values
+
+    def check(self, data_path):
+        # Hash the data and, if it changed since last time, forget everything computed from the old data.
+        data_hash = content_hash(data_path)
+        with self.lock:
+            old_hash = self.data_hashes.get(str(data_path))
+            self.data_hashes[str(data_path)] = data_hash
+            if old_hash and old_hash != data_hash:
+                for key in [key for key in self.entries if key[0] == old_hash]:
+                    self.size -= self.entries.pop(key).nbytes
+        if old_hash != data_hash and self.folder:
+            ticker_folder = self.folder / pathlib.Path(data_path).stem
+            if ticker_folder.exists():
+                for file in ticker_folder.iterdir():
+                    if not file.name.startswith(data_hash):
+                        file.unlink(missing_ok=True)
+        return data_hash
+
+    def remember(self, key, values):
+        # Caller holds the lock.
+        if values.nbytes > self.memory_budget or key in self.entries:
+            return
+        self.entries[key] = values
+        self.size += values.nbytes
+        while self.size > self.memory_budget:
+            self.size -= self.entries.popitem(last=False)[1].nbytes
+
+    def file_path(self, data_path, key):
+        data_hash, name, params = key
+        suffix = "".join(f"-{param}{value}" for param, value in params)
+        return self.folder / pathlib.Path(data_path).stem / f"{data_hash}-{name}{suffix}-v{VERSION}.npy"
+
+    def load(self, data_path, key):
+        if not self.folder:
+            return None
+        try:
+            values = np.load(self.file_path(data_path, key))
+        except (OSError, ValueError): # missing, or half-written by a process that crashed
+            return None
+        values.flags.writeable = False
+        return values
+
+    def save(self, data_path, key, values):
+        if not self.folder:
+            return
+        path = self.file_path(data_path, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(temp_path, path)
+
+    def forget(self, data_path):
+        # Drop everything cached for one ticker, e.g. when it is removed.
+        with self.lock:
+            data_hash = self.data_hashes.pop(str(data_path), None)
+            for key in [key for key in self.entries if key[0] == data_hash]:
+                self.size -= self.entries.pop(key).nbytes
+        if self.folder:
+            shutil.rmtree(self.folder / pathlib.Path(data_path).stem, ignore_errors=True)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.data_hashes.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "disk-hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self.entries), "bytes": self.size}
+
+# The cache backtests use, one per process. configure() changes its budget or turns on the disk layer.
+cache = IndicatorCache()
+
+def configure(memory_budget=None, folder=None):
+    # folder=None keeps the cache in memory only.
+    if memory_budget is not None:
+        cache.memory_budget = memory_budget
+    cache.folder = pathlib.Path(folder) if folder else None
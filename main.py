@@ -1,4 +1,7 @@
-import threading, tkinter
+import time
+started = time.perf_counter() # for the startup report (python main.py --startup-report)
+
+import json, queue, sys, threading, tkinter
 import tkinter.ttk as ttk
 
 import utils
@@ -174,17 +177,23 @@ entry_frame = tkinter.Frame(root, bg="#ffffff")
 # ticker entry frame | slaves: ticker entry widget and add ticker button
 ticker_entry_frame = tkinter.Frame(entry_frame, bg="#ffffff")
 
-# add ticker button function
+# add ticker button function (downloads on a worker thread, stores on the main thread)
 def on_add_ticker():
     ticker = tickerEntered.get()
-    try:
-        utils.ticker_add(ticker)
-        updateGUI()
-        error_label.config(text="TICKER HAS BEEN ADDED", fg="#0CB40F")
-    except Exception as e:
-        error_label.config(text=str(e), fg="#DD0F0F")
 
-    root.after(3000, lambda: error_label.config(text=''))
+    def on_done(fetched, error):
+        try:
+            if error:
+                raise error
+            utils.ticker_store(*fetched)
+            updateGUI()
+            error_label.config(text="TICKER HAS BEEN ADDED", fg="#0CB40F")
+        except Exception as e:
+            error_label.config(text=str(e), fg="#DD0F0F")
+
+        root.after(3000, lambda: error_label.config(text=''))
+
+    start_job(lambda: utils.ticker_fetch(ticker), on_done, f"Downloading {ticker.upper()}...")
 
 # ticker entry widget
 tickerEntered = tkinter.StringVar()
@@ -288,6 +297,10 @@ def on_ticker_change(*args):
         backtest_ticker_button.config(state="normal")
         results_frame.pack_forget()
 
+    if job_busy: # the running job's ticker must not be backtested again or removed before it's done
+        remove_ticker_button.config(state="disabled")
+        backtest_ticker_button.config(state="disabled")
+
 # backtest ticker button function
 def on_backtest_ticker():
     popup = tkinter.Toplevel(root, bg="#ffffff")
@@ -416,9 +429,25 @@ def on_backtest_ticker():
         riskControl = riskControlVar.get()
         riskControl = True if riskControl == "YES" else False
 
-        utils.ticker_backtest(ticker, balanceAllocated, term, riskControl)
-        updateGUI()
-        tickerVar.set(ticker)
+        # simulate on a worker thread; apply and plot on the main thread once it's done
+        def on_done(result, error):
+            if error:
+                error_label.config(text=str(error), fg="#DD0F0F")
+                root.after(3000, lambda: error_label.config(text=''))
+                return
+            if ticker not in utils.tickerData: # removed while it was being backtested
+                return
+            stats, chart = result
+            utils.ticker_backtest_apply(ticker, stats)
+            updateGUI()
+            tickerVar.set(ticker)
+            utils.plot_backtest(ticker, term, riskControl, chart)
+
+        start_job(
+            lambda: utils.ticker_backtest_run(ticker, balanceAllocated, term, riskControl),
+            on_done,
+            f"Backtesting {ticker}..."
+        )
         popup.destroy()
 
     # enter button
@@ -568,6 +597,98 @@ highest_win_label_var.grid(row=5, column=1, sticky='e')
 highest_loss_label.grid(row=6, column=0, sticky='w')
 highest_loss_label_var.grid(row=6, column=1, sticky='e')
 
+# job frame | slaves: job label, progress bar, cancel button (shown while a worker thread is busy)
+job_frame = tkinter.Frame(root, bg="#ffffff")
+
+job_label = tkinter.Label(
+    job_frame,
+    font=("Consolas", 11, "italic"),
+    bg="#ffffff"
+)
+job_progress = ttk.Progressbar(
+    job_frame,
+    mode="indeterminate",
+    length=120
+)
+
+# cancel button function: the job can't be stopped mid-way, but its result will be thrown away.
+def cancel_job():
+    global job_id
+    job_id += 1
+    hide_job()
+
+cancel_button = tkinter.Button(
+    job_frame,
+    text="CANCEL",
+    command=cancel_job,
+    font=("Consolas", 9)
+)
+
+# grid of job label, progress bar and cancel button formed by job_frame
+job_label.grid(row=0, column=0, columnspan=2, sticky='w')
+job_progress.grid(row=1, column=0, padx=(0, 10))
+cancel_button.grid(row=1, column=1)
+
+# Background jobs. Widgets may only be touched from the Tk main thread, so worker threads
+# never call back into Tk: they put their result on job_queue, which poll_jobs drains with root.after.
+job_queue = queue.Queue()
+job_id = 0 # id of the job whose result we're waiting for; bumped on cancel so stale results are ignored
+job_busy = False # True while the progress bar is shown; the buttons that change tickers stay disabled
+
+def start_job(work, on_done, message=None):
+    # Runs work() on a worker thread, then on_done(result, error) on the main thread.
+    global job_id
+    job_id += 1
+    this_job = job_id
+
+    def worker():
+        try:
+            job_queue.put((this_job, on_done, work(), None))
+        except Exception as e:
+            job_queue.put((this_job, on_done, None, e))
+
+    threading.Thread(target=worker, daemon=True).start()
+    if message:
+        show_job(message)
+
+def poll_jobs():
+    try:
+        while True:
+            this_job, on_done, result, error = job_queue.get_nowait()
+            if this_job == job_id: # not cancelled or replaced
+                hide_job()
+                try:
+                    on_done(result, error)
+                except Exception as e: # reported, so one failed job doesn't stop polling for the next
+                    error_label.config(text=str(e), fg="#DD0F0F")
+                    root.after(3000, lambda: error_label.config(text=''))
+    except queue.Empty:
+        pass
+    finally:
+        root.after(100, poll_jobs)
+
+def show_job(message):
+    global job_busy
+    job_busy = True
+    job_label.config(text=message)
+    add_ticker_button.config(state="disabled")
+    reset_button.config(state="disabled")
+    reset_hard_button.config(state="disabled")
+    backtest_ticker_button.config(state="disabled")
+    remove_ticker_button.config(state="disabled")
+    job_progress.start(15)
+    job_frame.pack(side="bottom", pady=10)
+
+def hide_job():
+    global job_busy
+    job_busy = False
+    job_progress.stop()
+    job_frame.pack_forget()
+    add_ticker_button.config(state="normal")
+    reset_button.config(state="normal")
+    reset_hard_button.config(state="normal")
+    on_ticker_change() # restores the backtest / remove buttons for the selected ticker
+
 def updateGUI():
     balance = utils.portfolio["balance"]
     initialBalance = utils.portfolio["initial-balance"]
@@ -590,14 +711,25 @@ def show_main_frame():
     interact_frame.pack()
 
 def start_program():
-
-    def threaded_init():
+    # utils.init only reads the database with the standard library, so it runs right here; the heavy
+    # libraries are loaded on a background thread while the user looks at the portfolio.
+    try:
         utils.init()
-        updateGUI()
-        loading_label.config(text="Done!") # may not be thread-safe
-        root.after(800, show_main_frame) # may not be thread-safe
+    except Exception as error:
+        loading_label.config(text=f"Could not start: {error}")
+        return
+    updateGUI()
+    show_main_frame()
+    root.update_idletasks()
+    utils.startup_timings["window"] = time.perf_counter() - started
+
+    def warm_up():
+        utils.warm_up()
+        if "--startup-report" in sys.argv:
+            print(json.dumps({phase: round(seconds, 4) for phase, seconds in utils.startup_report().items()}))
 
-    threading.Thread(target=threaded_init, daemon=True).start()
+    threading.Thread(target=warm_up, daemon=True).start()
 
-root.after(1000, start_program)
-root.mainloop()
\ No newline at end of file
+root.after(100, poll_jobs)
+root.after_idle(start_program)
+root.mainloop()
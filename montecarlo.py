@@ -0,0 +1,79 @@
+import numpy as np
+
+import indicators
+from backtester import crossovers, simulate_signals, term_windows
+from storage import load_prices
+
+# How much a backtest's result depends on the cost model: the same trades re-priced under thousands of
+# random slippage and fee scenarios. Signal days don't depend on costs, so the backtest's trade list is found
+# once; then every scenario is priced at the same time, as one column of a (scenarios,) array per trade.
+# Each scenario draws:
+#   - a control bias (uniform between `bias`), used in place of the 0.1 of indicators.slippage,
+#   - a lognormal factor per buy and per sell (spread `noise`) on the day's slippage, for the part of it
+#     the High-Low range and volume don't explain,
+#   - a broker fee per share bought (uniform between `fee`), in place of the 1 cent.
+# Slippage is still kept between 0.05% and 5%.
+# A scenario that can't afford one share on a buy day skips that trade; the backtest would wait for the next
+# crossover instead, but that needs a balance below one share's price, where the difference hardly matters.
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+def distribution(name, values):
+    # e.g. {"net-change-mean": ..., "net-change-p5": ...}
+    stats = {f"{name}-mean": float(values.mean()), f"{name}-std": float(values.std()),
+             f"{name}-min": float(values.min()), f"{name}-max": float(values.max())}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f"{name}-p{percentile}"] = float(value)
+    return stats
+
+def trade_days(data_path, df, balance_allocated, term, risk_control):
+    # The backtest's final balance and its trades as (buy day, sell day) rows, in positions of df.
+    short, long = term_windows(term)
+    close = df["Close"].to_numpy()
+    crossUp, crossDown = crossovers(
+        indicators.cache.get(data_path, df, "sma", window=short), indicators.cache.get(data_path, df, "sma", window=long))
+    atr = indicators.cache.get(data_path, df, "atr") if risk_control else None
+    sa = indicators.cache.get(data_path, df, "sa")
+    # from day `long`, like backtest's df[long:] (see sweep)
+    final_balance, trades = simulate_signals(close, sa, atr, crossUp, crossDown, balance_allocated, risk_control, start=long)
+    return final_balance, np.array(trades, dtype=np.int64).reshape(-1, 2)
+
+def monte_carlo(data_path, balance_allocated, term, risk_control, scenarios=10000, bias=(0.05, 0.2), noise=0.5,
+                fee=(0.0, 0.02), seed=None):
+    # Returns stats: the distributions of final balance and net change over the scenarios, the share of
+    # scenarios that lost money, and the result with the backtest's own costs.
+    if scenarios < 1:
+        raise Exception("INVALID SCENARIO COUNT")
+    df = load_prices(data_path)
+    close = df["Close"].to_numpy()
+    prop_range, norm_volume = indicators.slippage_inputs(df)
+    backtest_balance, trades = trade_days(data_path, df, balance_allocated, term, risk_control)
+
+    rng = np.random.default_rng(seed)
+    control_bias = rng.uniform(bias[0], bias[1], scenarios)
+    fees = rng.uniform(fee[0], fee[1], scenarios)
+    shocks = rng.lognormal(0.0, noise, (len(trades), 2, scenarios)) if noise else np.ones((len(trades), 2, scenarios))
+
+    def slippage(day, shock): # as indicators.slippage, on one day for every scenario
+        sa = control_bias * prop_range[day] / norm_volume[day] / 100 * shock
+        return np.fmax(np.minimum(sa, 0.05), 0.0005)
+
+    balances = np.full(scenarios, float(balance_allocated))
+    for trade, (buy, sell) in enumerate(trades): # tens of trades, each priced for every scenario at once
+        buyPrice = close[buy] * (1 + slippage(buy, shocks[trade, 0])) + fees
+        buyVolume = balances // buyPrice
+        sellPrice = close[sell] * (1 - slippage(sell, shocks[trade, 1]))
+        balances += (sellPrice - buyPrice) * buyVolume
+
+    net_change = (balances / balance_allocated - 1) * 100
+    return {
+        "term": term,
+        "risk-control": risk_control,
+        "balance-allocated": balance_allocated,
+        "scenarios": scenarios,
+        "trades": len(trades),
+        "backtest-final-balance": float(backtest_balance),
+        **distribution("final-balance", balances),
+        **distribution("net-change", net_change),
+        "loss-probability": float((balances < balance_allocated).mean())
+    }
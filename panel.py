@@ -0,0 +1,161 @@
+import numpy as np
+import pandas
+
+import indicators
+from backtester import term_windows
+from storage import load_prices
+
+# Portfolio-level backtest: every ticker trades out of one shared cash balance, so positions compete for
+# capital on the same day. Prices and indicators are aligned into date-by-ticker panels (one row per date
+# any ticker traded, NaN where a ticker has no bar), signals for all tickers come from one array pass,
+# and the simulation loops over days only, with every day's sells and buys done as array operations.
+
+ALLOCATIONS = ["equal", "fraction"]
+
+def align(frames):
+    # The union of the frames' dates, and the row each frame's bars land on in it.
+    if not frames:
+        return np.array([], "datetime64[ns]"), []
+    dates = np.unique(np.concatenate([df.index.values for df in frames.values()]))
+    return dates, [np.searchsorted(dates, df.index.values) for df in frames.values()]
+
+def build_panel(paths, term, risk_control):
+    # paths: {ticker: price file}. Returns a dict of (days, tickers) arrays plus the dates and tickers.
+    # Each ticker's indicators are computed on its own bars (as in backtest) before being placed in the panel.
+    short, long = term_windows(term)
+    tickers = list(paths)
+    frames = {ticker: load_prices(path) for ticker, path in paths.items()}
+    dates, positions = align(frames)
+
+    shape = (len(dates), len(tickers))
+    panel = {name: np.full(shape, np.nan) for name in ["close", "sa", "atr", "short", "long", "volume"]}
+    has_bar = np.zeros(shape, dtype=bool)
+    tradable = np.zeros(shape, dtype=bool)
+    for column, (ticker, df) in enumerate(frames.items()):
+        rows = positions[column]
+        has_bar[rows, column] = True # even where a value is missing: like in backtest, it's still a bar
+        data_path = paths[ticker]
+        panel["close"][rows, column] = df["Close"].to_numpy()
+        panel["volume"][rows, column] = df["Volume"].to_numpy()
+        panel["short"][rows, column] = indicators.cache.get(data_path, df, "sma", window=short)
+        panel["long"][rows, column] = indicators.cache.get(data_path, df, "sma", window=long)
+        panel["sa"][rows, column] = indicators.cache.get(data_path, df, "sa")
+        if risk_control:
+            panel["atr"][rows, column] = indicators.cache.get(data_path, df, "atr")
+        # backtest starts at the ticker's bar `long`, which only serves as the first yesterday
+        tradable[rows[long + 1:], column] = True
+    panel["has-bar"] = has_bar
+    panel["tradable"] = tradable
+    panel["dates"] = pandas.DatetimeIndex(dates, name="Date")
+    panel["tickers"] = tickers
+    return panel
+
+def forward_fill(values):
+    # Each NaN replaced by the last number above it in its column (rows are days).
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+def panel_crossovers(panel):
+    # crossUp / crossDown for every ticker and day at once. "Yesterday" is each ticker's previous bar,
+    # which on the panel is the last row above where it had one, with its SMAs as they are there
+    # (a missing SMA stays missing, as in backtest, rather than being filled from an older bar).
+    short, long, has_bar = panel["short"], panel["long"], panel["has-bar"]
+    last_bar = np.where(has_bar, np.arange(len(has_bar))[:, None], -1)
+    np.maximum.accumulate(last_bar, axis=0, out=last_bar)
+    previous = np.full_like(last_bar, -1)
+    previous[1:] = last_bar[:-1] # -1 on a ticker's first bar: no yesterday
+    columns = np.arange(short.shape[1])
+    prev_short = np.where(previous >= 0, short[previous, columns], np.nan)
+    prev_long = np.where(previous >= 0, long[previous, columns], np.nan)
+    crossUp = has_bar & (short >= long) & (prev_short <= prev_long)
+    crossDown = has_bar & (short <= long) & (prev_short >= prev_long)
+    return crossUp, crossDown
+
+def simulate_portfolio(panel, balance, risk_control, allocation="equal", max_positions=20, fraction=0.1):
+    # Trade every ticker from one cash balance, with the same signals, ATR stop and costs as backtest.
+    # Each day: sell first (cash comes back), then buy today's upward crossovers, biggest dollar volume first:
+    #   allocation="equal": each new position gets 1/max_positions of the equity, at most max_positions open
+    #   allocation="fraction": each new position gets `fraction` of the equity
+    # A position is never bigger than the cash left. Open positions are valued at the last close.
+    # Returns (stats, equity curve Series, trades DataFrame).
+    if allocation not in ALLOCATIONS:
+        raise Exception("INVALID ALLOCATION")
+    crossUp, crossDown = panel_crossovers(panel)
+    crossUp &= panel["tradable"]
+    close, sa, atr = panel["close"], panel["sa"], panel["atr"]
+    marks = forward_fill(close) # what an open position is worth on a day its ticker didn't trade
+    dollar_volume = close * panel["volume"]
+    days, count = close.shape
+
+    cash = balance
+    shares = np.zeros(count)
+    buyPrice, buyClose, buyDay = np.zeros(count), np.zeros(count), np.zeros(count, dtype=np.int64)
+    equity = np.empty(days)
+    trades = []
+    last_equity = balance
+    for day in range(days):
+        held = np.flatnonzero(shares)
+        if len(held):
+            sell = crossDown[day, held]
+            if risk_control:
+                sell |= close[day, held] <= (buyClose[held] - (2 * atr[day, held]))
+            sold = held[sell]
+            if len(sold):
+                sellPrice = close[day, sold] * (1 - sa[day, sold])
+                cash += float((sellPrice * shares[sold]).sum())
+                trades += [(ticker, buyDay[ticker], day, shares[ticker], buyPrice[ticker], price)
+                           for ticker, price in zip(sold.tolist(), sellPrice.tolist())]
+                shares[sold] = 0
+        else:
+            sold = held
+
+        candidates = np.flatnonzero(crossUp[day] & (shares == 0))
+        candidates = candidates[~np.isin(candidates, sold)] # nothing is bought back on the day it's sold
+        if len(candidates) and cash > 0:
+            candidates = candidates[np.argsort(-dollar_volume[day, candidates], kind="stable")]
+            if allocation == "equal":
+                candidates = candidates[:max(0, max_positions - np.count_nonzero(shares))]
+                target = last_equity / max_positions
+            else:
+                target = last_equity * fraction
+            price = close[day, candidates] * (1 + sa[day, candidates]) + 0.01
+            # each takes its target, or what's left, in priority order
+            budget = np.clip(cash - target * np.arange(len(candidates)), 0, target)
+            volume = budget // price
+            bought = volume > 0
+            candidates, price, volume = candidates[bought], price[bought], volume[bought]
+            cost = price * volume
+            cash -= float(cost.sum())
+            shares[candidates] = volume
+            buyPrice[candidates], buyClose[candidates], buyDay[candidates] = price, close[day, candidates], day
+
+        last_equity = cash + float(np.nansum(shares * marks[day]))
+        equity[day] = last_equity
+
+    dates, tickers = panel["dates"], panel["tickers"]
+    trades = pandas.DataFrame(
+        [(tickers[ticker], dates[buy], dates[sell], volume, (sellPrice - price) * volume)
+         for ticker, buy, sell, volume, price, sellPrice in trades],
+        columns=["ticker", "buy-date", "sell-date", "shares", "profit"]
+    )
+    equity = pandas.Series(equity, index=dates, name="equity")
+    peak = np.maximum.accumulate(equity.to_numpy()) if days else np.array([balance])
+    stats = {
+        "tickers": count,
+        "days": days,
+        "balance-allocated": balance,
+        "final-balance": float(equity.iloc[-1]) if days else balance,
+        "net-change": ((float(equity.iloc[-1]) if days else balance) / balance - 1) * 100,
+        "cash": cash,
+        "open-positions": int(np.count_nonzero(shares)),
+        "trades": len(trades),
+        "max-drawdown": float(((equity.to_numpy() / peak) - 1).min() * 100) if days else 0.0
+    }
+    return stats, equity, trades
+
+def portfolio_backtest(paths, balance, term, risk_control, allocation="equal", max_positions=20, fraction=0.1):
+    panel = build_panel(paths, term, risk_control)
+    stats, equity, trades = simulate_portfolio(panel, balance, risk_control, allocation, max_positions, fraction)
+    stats = {"term": term, "risk-control": risk_control, "allocation": allocation, **stats}
+    return stats, equity, trades
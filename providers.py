@@ -0,0 +1,75 @@
+import json, pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+# A data provider fetches OHLCV bars (daily, or intraday: see utils.INTERVALS) and company names.
+# Any object with these two methods works:
+#   download(tickers, period=None, start=None, interval="1d") -> {ticker: DataFrame indexed by Date,
+#       with Close/High/Low/Open/Volume columns (empty if nothing was found)}
+#   company_name(ticker) -> str
+# Either period (e.g. '5y') or start (e.g. '2024-01-31', inclusive) is given.
+
+class YahooProvider:
+    # Yahoo Finance through yfinance, many tickers per request.
+
+    def __init__(self):
+        import yfinance # only needed when this provider is actually used
+        self.yf = yfinance
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        # Sometimes the DataFrame downloaded from yfinance is multiindexed.
+        # To circumvent this, we force multiindexing by inputting the tickers as a list.
+        # Then, we can slice the DataFrame per ticker.
+        df = self.yf.download(list(tickers), period=period, start=start, interval=interval, auto_adjust=True, progress=False)
+        found = set() if df.empty else set(df.columns.get_level_values("Ticker"))
+        frames = {}
+        for ticker in tickers:
+            if ticker in found:
+                # Tickers with a shorter history come back padded with empty rows; drop them.
+                frames[ticker] = df.xs(ticker, level="Ticker", axis=1).dropna(how="all")
+            else:
+                frames[ticker] = pandas.DataFrame()
+        return frames
+
+    def company_name(self, ticker):
+        ticker_info = self.yf.Ticker(ticker).get_info()
+        # Sometimes the company name is missing.
+        return ticker_info.get("longName") or ticker_info.get("shortName") or "UNKNOWN COMPANY"
+
+class FixtureProvider:
+    # Reads {folder}/{TICKER}.csv files (same layout as yfinance's; {TICKER}-{interval}.csv for intervals other
+    # than 1d) and an optional {folder}/names.json of {ticker: company name}. For offline tests and benchmarks.
+    # `period` is ignored: fixtures come back whole.
+
+    def __init__(self, folder):
+        self.folder = pathlib.Path(folder)
+        names_path = self.folder / "names.json"
+        self.names = json.loads(names_path.read_text()) if names_path.exists() else {}
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        frames = {}
+        for ticker in tickers:
+            csv_path = self.folder / (f"{ticker}.csv" if interval == "1d" else f"{ticker}-{interval}.csv")
+            if not csv_path.exists():
+                frames[ticker] = pandas.DataFrame()
+                continue
+            df = pandas.read_csv(csv_path, parse_dates=["Date"], index_col="Date")
+            frames[ticker] = df[df.index >= start] if start else df
+        return frames
+
+    def company_name(self, ticker):
+        return self.names.get(ticker, "UNKNOWN COMPANY")
+
+def company_names(provider, tickers, workers=8):
+    # {ticker: company name, or the exception that fetching it raised}. Names are fetched concurrently:
+    # Yahoo has no batch call for them, so one at a time is a network round trip per ticker.
+    def fetch(ticker):
+        try:
+            return provider.company_name(ticker)
+        except Exception as e:
+            return e
+    if len(tickers) <= 1:
+        return {ticker: fetch(ticker) for ticker in tickers}
+    with ThreadPoolExecutor(max_workers=min(workers, len(tickers))) as pool:
+        return dict(zip(tickers, pool.map(fetch, tickers)))
@@ -0,0 +1,107 @@
+import html, os, pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtester import plot_backtest, run_backtest
+from storage import stored_tickers
+
+# Every combination of the backtest settings: (term, risk control)
+SETTINGS = [("short", True), ("short", False), ("long", True), ("long", False)]
+
+FIGURE_DPI = 100 # plot_backtest draws 14 x 7 inches, so 1400 pixels wide
+
+def minmax_rows(values, width):
+    # Positions of the lowest and highest value in each of `width` equal buckets. Drawing only these
+    # rows looks the same at that pixel width (every peak and trough is kept) but costs O(width), not O(days).
+    days = len(values)
+    if days <= 2 * width:
+        return np.arange(days)
+    edges = np.linspace(0, days, width + 1).astype(int)
+    rows = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        bucket = values[start:stop]
+        if np.isnan(bucket).all():
+            rows.append(start)
+            continue
+        rows += [start + np.nanargmin(bucket), start + np.nanargmax(bucket)]
+    return np.unique(rows)
+
+def downsample_chart(chart, width):
+    # The same chart with only the rows needed at `width` pixels: min/max of the Close and both SMAs,
+    # plus every trade day (so markers and labels land on the exact prices).
+    df = chart["prices"]
+    if len(df) <= 2 * width:
+        return chart
+    rows = [minmax_rows(df[column].to_numpy(), width) for column in ["Close", chart["short-label"], chart["long-label"]]]
+    trade_days = np.flatnonzero(df.index.isin([day for trade in chart["trades"] for day in trade]))
+    rows = np.unique(np.concatenate(rows + [trade_days, [0, len(df) - 1]]))
+    return {**chart, "prices": df.iloc[rows]}
+
+def render_worker(job):
+    # Runs in a pool process: backtest without the GUI, then draw off-screen and save.
+    ticker, data_path, balance_allocated, term, risk_control, image_path = job
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    result = {"ticker": ticker, "term": term, "risk-control": risk_control, "image": None, "error": None}
+    try:
+        if data_path is None:
+            raise Exception("NOT IN MEMORY")
+        stats, chart = run_backtest(data_path, balance_allocated, term, risk_control)
+        result["net-change"] = stats["net-change"]
+        figure = plot_backtest(ticker, term, risk_control, downsample_chart(chart, 14 * FIGURE_DPI), show=False)
+        figure.savefig(image_path, dpi=FIGURE_DPI)
+        plt.close(figure)
+        result["image"] = image_path.name
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def write_index(output_folder, results):
+    rows = []
+    for result in results:
+        setting = f"{result['term']}-term, {'risk-controlled' if result['risk-control'] else 'no risk control'}"
+        if result["error"]:
+            cell = f"<td>{html.escape(result['error'])}</td>"
+        else:
+            image = html.escape(result["image"])
+            cell = f"<td>{result['net-change']:+.2f}%<br><a href=\"{image}\"><img src=\"{image}\" width=\"700\"></a></td>"
+        rows.append(f"<tr><td>{html.escape(result['ticker'])}</td><td>{setting}</td>{cell}</tr>")
+
+    index_path = pathlib.Path(output_folder) / "index.html"
+    index_path.write_text(
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>SMA Crossover Backtests</title></head><body>\n"
+        "<table border=\"1\" cellpadding=\"6\">\n<tr><th>Ticker</th><th>Settings</th><th>Net Change</th></tr>\n"
+        + "\n".join(rows) + "\n</table>\n</body></html>\n"
+    )
+    return index_path
+
+def render_report(data_folder, output_folder, balance_allocated, settings=None, tickers=None, workers=None, image_format="png"):
+    # One chart image per ticker per setting, rendered on a process pool, plus an index.html linking them all.
+    # Returns the list of per-image results (net change, file name or error).
+    if image_format not in ("png", "svg"):
+        raise Exception("INVALID IMAGE FORMAT")
+    settings = settings or SETTINGS
+    output_folder = pathlib.Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    paths = stored_tickers(data_folder)
+    tickers = list(paths) if tickers is None else [ticker.upper() for ticker in tickers]
+    jobs = [
+        (ticker, paths.get(ticker), balance_allocated, term, risk_control,
+         output_folder / f"{ticker}-{term}-{'rc' if risk_control else 'no-rc'}.{image_format}")
+        for ticker in tickers
+        for term, risk_control in settings
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        results = [render_worker(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(render_worker, jobs))
+
+    write_index(output_folder, results)
+    return results
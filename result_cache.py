@@ -0,0 +1,102 @@
+import hashlib, json, os, pathlib, threading
+
+import pandas
+
+from indicators import content_hash
+
+# Finished backtests on disk, one JSON file per (price data, parameters), so an identical rerun (same data,
+# balance, term, risk control and engine) is a file read instead of a simulation. The key uses the price
+# file's content hash, so refreshed data never hits an old result. Files are evicted least recently used
+# first once the folder grows past max_bytes.
+
+VERSION = 2 # part of every key: bump it when a change to the simulation makes old results wrong
+
+class ResultCache:
+
+    def __init__(self, folder=None, max_bytes=64 * 2**20):
+        self.folder = pathlib.Path(folder) if folder else None
+        self.max_bytes = max_bytes
+        self.size = None # bytes in the folder, counted on first write
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, data_path, balance_allocated, term, risk_control, engine):
+        # None when the cache is off.
+        if not self.folder:
+            return None
+        parts = [VERSION, content_hash(data_path), repr(float(balance_allocated)), term, bool(risk_control), engine]
+        return hashlib.blake2b(json.dumps(parts).encode(), digest_size=16).hexdigest()
+
+    def get(self, key):
+        # (stats, trades) stored under key, or None.
+        path = self.folder / f"{key}.json"
+        try:
+            entry = json.loads(path.read_text())
+            os.utime(path) # a hit counts as a use, for eviction
+        except (OSError, ValueError): # missing, evicted meanwhile, or half-written by a process that crashed
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        trades = [(pandas.Timestamp(buy), pandas.Timestamp(sell)) for buy, sell in entry["trades"]]
+        return entry["stats"], trades
+
+    def put(self, key, stats, trades):
+        entry = {
+            "stats": {field: value for field, value in stats.items() if field != "timings"},
+            "trades": [(buy.isoformat(), sell.isoformat()) for buy, sell in trades]
+        }
+        text = json.dumps(entry)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.folder / f"{key}.json"
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_text(text)
+        os.replace(temp_path, path)
+        with self.lock:
+            if self.size is None:
+                self.size = sum(file.stat().st_size for file in self.folder.glob("*.json"))
+            else:
+                self.size += len(text)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Caller holds the lock. Oldest-used files go first until the folder is down to 3/4 of max_bytes,
+        # so a full cache isn't rescanned on every write. Each process keeps its own count of the size,
+        # so with several processes writing at once the folder can overshoot a little before it's trimmed.
+        files = []
+        for file in self.folder.glob("*.json"):
+            try:
+                info = file.stat()
+            except OSError:
+                continue
+            files.append((info.st_mtime_ns, info.st_size, file))
+        files.sort()
+        self.size = sum(size for _, size, _ in files)
+        for _, size, file in files:
+            if self.size <= self.max_bytes * 3 // 4:
+                break
+            file.unlink(missing_ok=True)
+            self.size -= size
+
+    def clear(self):
+        if self.folder and self.folder.exists():
+            for file in self.folder.glob("*.json"):
+                file.unlink(missing_ok=True)
+        with self.lock:
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self.size}
+
+# The cache backtests use, one per process; off until configure() gives it a folder.
+cache = ResultCache()
+
+def configure(folder=None, max_bytes=None):
+    # folder=None turns the cache off.
+    cache.folder = pathlib.Path(folder) if folder else None
+    cache.size = None
+    if max_bytes is not None:
+        cache.max_bytes = max_bytes
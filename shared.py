@@ -0,0 +1,79 @@
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# NumPy arrays placed once in a block of shared memory, for process-pool workers. The parent packs the
+# arrays into one block and sends workers only its handle (name and layout, a few hundred bytes); each worker
+# attaches by name and gets read-only views of the same pages. Nothing is copied or pickled per worker or
+# per job, so memory and serialization stay flat however many workers there are.
+# The block is freed by close(), when its SharedArrays is garbage-collected or at exit; if the parent
+# is killed outright, multiprocessing's resource tracker removes it.
+
+ALIGNMENT = 64 # every array starts on a cache line
+
+_owned = {} # block name -> views, for blocks created by this process
+_attached = {} # block name -> (SharedMemory, views), for blocks this process attached to
+
+def release(memory):
+    try:
+        memory.close()
+    except BufferError: # views still alive somewhere; the mapping goes when they do
+        pass
+    try:
+        memory.unlink()
+    except FileNotFoundError:
+        pass
+
+class SharedArrays:
+    # Use as a context manager (or call close()) around the pool that reads it.
+
+    def __init__(self, arrays, meta=None):
+        # arrays: {name: array}; meta: anything small and picklable that workers should get with the views.
+        layout, size = [], 0
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        for name, array in arrays.items():
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout.append((name, array.dtype.str, array.shape, size))
+            size += array.nbytes
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.arrays = views(self.memory, layout)
+        for name, array in arrays.items():
+            self.arrays[name].flags.writeable = True
+            self.arrays[name][...] = array
+            self.arrays[name].flags.writeable = False
+        self.handle = (self.memory.name, tuple(layout), meta)
+        _owned[self.memory.name] = self.arrays
+        self.finalizer = weakref.finalize(self, release, self.memory)
+
+    def close(self):
+        _owned.pop(self.memory.name, None)
+        self.arrays = None
+        self.finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def views(memory, layout):
+    arrays = {}
+    for name, dtype, shape, offset in layout:
+        arrays[name] = np.ndarray(shape, dtype, buffer=memory.buf, offset=offset)
+        arrays[name].flags.writeable = False
+    return arrays
+
+def attach(handle):
+    # In a worker: {name: read-only view} of the block, plus the meta as "meta". The block is opened once
+    # per process and kept until the process exits, so every job after the first gets its views for free.
+    name, layout, meta = handle
+    if name in _owned: # the parent itself, or a forked worker that inherited its mapping
+        return {**_owned[name], "meta": meta}
+    if name not in _attached:
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False) # Python 3.13+: the parent owns it
+        except TypeError:
+            memory = shared_memory.SharedMemory(name=name)
+        _attached[name] = (memory, views(memory, layout))
+    return {**_attached[name][1], "meta": meta}
@@ -0,0 +1,255 @@
+import hashlib, json, os, pathlib, shutil, threading
+
+import numpy as np
+import pandas
+
+# Price data is stored one file per ticker in the data folder, in one of these formats:
+#   csv: Data/{TICKER}.csv, the text file yfinance produces. Slow to parse, but human-readable.
+#   npy: Data/{TICKER}.npy, one float64 array of shape (6, days). Row 0 is the date in seconds
+#        since the epoch, rows 1-5 are COLUMNS. It is memory-mapped on load, so nothing is parsed or copied.
+#   chunks: Data/{TICKER}.chunks/, a folder of npy files covering a month of intraday bars each (2024-01.npy)
+#        or a year of daily bars (2024.npy). For minute data, which runs to millions of rows: a backtest
+#        can read it a chunk at a time (streaming.file_bars) instead of all at once.
+# Prices are cleaned once, when they're stored (ingest_prices): duplicate dates dropped, dates sorted,
+# empty rows dropped, columns in COLUMNS order as float64. Each ingested file gets an entry in the folder's
+# manifest.json with its row count, date range, layout and checksum, so loads can skip the cleaning and
+# caches can use the checksum without hashing the file again.
+FORMATS = {"csv": ".csv", "npy": ".npy", "chunks": ".chunks"}
+COLUMNS = ["Close", "High", "Low", "Open", "Volume"]
+MANIFEST = "manifest.json"
+GAP_DAYS = 7 # calendar days without a bar that count as a gap (longer than any weekend plus holiday)
+
+def price_path(data_folder, ticker, storage_format):
+    if storage_format not in FORMATS:
+        raise Exception("INVALID STORAGE FORMAT")
+    return pathlib.Path(data_folder) / f"{ticker}{FORMATS[storage_format]}"
+
+def stored_tickers(data_folder):
+    # {ticker: path} of every price file in the data folder, whatever its format.
+    return {
+        file.stem: file for file in sorted(pathlib.Path(data_folder).iterdir())
+        if file.suffix in FORMATS.values()
+    }
+
+def chunk_paths(path):
+    # The chunk files of a .chunks folder, oldest first.
+    return sorted(file for file in pathlib.Path(path).iterdir() if file.suffix == ".npy")
+
+def save_chunks(df, path, replace=True):
+    # Each chunk is replaced atomically, like a single file. With replace=True, df is the whole history and
+    # chunks outside it are deleted; otherwise only the chunks df covers are written.
+    path.mkdir(parents=True, exist_ok=True)
+    dates = df.index.values.astype("datetime64[s]")
+    intraday = len(dates) > 1 and (np.diff(dates) < np.timedelta64(1, "D")).any()
+    periods = dates.astype("datetime64[M]" if intraday else "datetime64[Y]")
+    starts = np.concatenate(([0], np.flatnonzero(periods[1:] != periods[:-1]) + 1, [len(df)])) # df is sorted
+    names = set()
+    for start, stop in zip(starts[:-1], starts[1:]):
+        name = f"{periods[start]}.npy"
+        save_prices(df.iloc[start:stop], path / name)
+        names.add(name)
+    if replace:
+        for file in chunk_paths(path):
+            if file.name not in names:
+                file.unlink()
+
+def save_prices(df, path):
+    # Written to a temporary file first and then swapped in, so a crash never leaves half a file.
+    # On POSIX a DataFrame still memory-mapping the old file keeps seeing the old data; on Windows the swap
+    # fails while the old file is mapped, so prices that outlive a write are loaded with memory_map=False.
+    path = pathlib.Path(path)
+    if path.suffix == ".chunks":
+        return save_chunks(df, path)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    if path.suffix == ".csv":
+        df.to_csv(temp_path, index_label="Date")
+    else:
+        table = np.empty((1 + len(COLUMNS), len(df)))
+        table[0] = df.index.values.astype("datetime64[s]").astype(np.int64)
+        table[1:] = df[COLUMNS].to_numpy(dtype=np.float64).T
+        with open(temp_path, 'wb') as f:
+            np.save(f, table)
+    os.replace(temp_path, path)
+
+def clean_prices(df):
+    # Canonical form of downloaded prices, plus what was found on the way.
+    # Returns (df, quality) where quality counts duplicates, empty rows, rows with a NaN, and gaps.
+    duplicated = df.index.duplicated(keep='first')
+    df = df[~duplicated].sort_index()
+    empty = df[COLUMNS].isna().all(axis=1)
+    df = df[~empty][COLUMNS].astype(np.float64)
+    df.index = pandas.DatetimeIndex(df.index, name="Date")
+    if df.index.tz is not None: # intraday bars come with the exchange's time zone; everything is stored in UTC
+        df.index = df.index.tz_convert("UTC").tz_localize(None)
+
+    days_between = np.diff(df.index.values).astype("timedelta64[D]").astype(np.int64)
+    quality = {
+        "duplicates-dropped": int(duplicated.sum()),
+        "empty-rows-dropped": int(empty.sum()),
+        "nan-rows": int(df.isna().any(axis=1).sum()),
+        "gaps": int((days_between > GAP_DAYS).sum()),
+        "largest-gap-days": int(days_between.max()) if len(days_between) else 0
+    }
+    return df, quality
+
+def checksum(path):
+    # What manifest entries and the caches key on.
+    path = pathlib.Path(path)
+    digest = hashlib.blake2b(digest_size=16)
+    if path.is_dir():
+        for file in chunk_paths(path):
+            digest.update(file.name.encode())
+            digest.update(file.read_bytes())
+    else:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+def file_signature(path):
+    # Changes whenever the file is rewritten (save_prices always writes a new file), or for a .chunks
+    # folder, whenever one of its chunks is.
+    info = pathlib.Path(path).stat()
+    return [info.st_size, info.st_mtime_ns]
+
+def ingest_prices(df, path, record=True):
+    # Clean, store and record one ticker's prices. Returns its manifest entry.
+    # With record=False the caller writes the entry itself (update_manifest), e.g. once for a whole batch.
+    path = pathlib.Path(path)
+    df, quality = clean_prices(df)
+    save_prices(df, path)
+    entry = manifest_record(path, len(df), df.index[0] if len(df) else None, df.index[-1] if len(df) else None, quality)
+    if record:
+        update_manifest(path.parent, {path.stem: entry})
+    return entry
+
+def append_prices(df, path):
+    # Store bars that come after the last stored one and update the manifest. Returns the new entry.
+    # A .chunks folder only rewrites its last chunk (and adds new ones), so the history is never loaded whole.
+    path = pathlib.Path(path)
+    if path.suffix != ".chunks":
+        return ingest_prices(pandas.concat([load_prices(path), df[COLUMNS]]), path)
+
+    new, quality = clean_prices(df)
+    old_entry = read_manifest(path.parent).get(path.stem) or {}
+    last_chunk = load_prices(chunk_paths(path)[-1], memory_map=False) # its file is rewritten below
+    save_chunks(pandas.concat([last_chunk, new]), path, replace=False)
+
+    tables = [np.load(file, mmap_mode="r") for file in chunk_paths(path)]
+    first_date, last_date = (pandas.Timestamp(int(date), unit="s") for date in (tables[0][0, 0], tables[-1][0, -1]))
+    if len(new):
+        gap = (new.index[0] - last_chunk.index[-1]).days
+        quality["gaps"] += int(gap > GAP_DAYS)
+        quality["largest-gap-days"] = max(quality["largest-gap-days"], gap)
+    for field in ["duplicates-dropped", "empty-rows-dropped", "nan-rows", "gaps"]:
+        quality[field] += old_entry.get(field, 0)
+    quality["largest-gap-days"] = max(quality["largest-gap-days"], old_entry.get("largest-gap-days", 0))
+    entry = manifest_record(path, sum(table.shape[1] for table in tables), first_date, last_date, quality)
+    update_manifest(path.parent, {path.stem: entry})
+    return entry
+
+def manifest_record(path, rows, first_date, last_date, quality):
+    return {
+        "format": path.suffix[1:],
+        "rows": rows,
+        "first-date": first_date.isoformat() if first_date is not None else None,
+        "last-date": last_date.isoformat() if last_date is not None else None,
+        # npy / chunks: float64 arrays of shape (6, rows), row 0 the dates in epoch seconds; csv: a Date column,
+        # then the columns
+        "layout": {"dtype": "float64", "columns": ["Date"] + COLUMNS},
+        "checksum": checksum(path),
+        "signature": file_signature(path),
+        **quality
+    }
+
+_manifests = {} # folder -> (signature of manifest.json, its contents)
+_manifest_lock = threading.Lock()
+
+def read_manifest(data_folder):
+    # {ticker: entry}; kept in memory until the file changes, so looking up an entry per load is cheap.
+    manifest_path = pathlib.Path(data_folder) / MANIFEST
+    with _manifest_lock:
+        try:
+            signature = file_signature(manifest_path)
+        except FileNotFoundError:
+            return {}
+        known = _manifests.get(manifest_path)
+        if known and known[0] == signature:
+            return known[1]
+        manifest = json.loads(manifest_path.read_text())
+        _manifests[manifest_path] = (signature, manifest)
+        return manifest
+
+def update_manifest(data_folder, entries):
+    # Add or replace entries ({ticker: entry}); an entry of None removes the ticker.
+    manifest_path = pathlib.Path(data_folder) / MANIFEST
+    with _manifest_lock:
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        for ticker, entry in entries.items():
+            if entry is None:
+                manifest.pop(ticker, None)
+            else:
+                manifest[ticker] = entry
+        temp_path = manifest_path.with_name(f"{MANIFEST}.tmp")
+        temp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(temp_path, manifest_path)
+
+def manifest_entry(path):
+    # The manifest entry of a price file, or None if it has none or the file changed since it was written.
+    path = pathlib.Path(path)
+    entry = read_manifest(path.parent).get(path.stem)
+    if not entry or entry["format"] != path.suffix[1:]:
+        return None
+    try:
+        if entry["signature"] != file_signature(path):
+            return None
+    except FileNotFoundError:
+        return None
+    return entry
+
+def remove_files(path):
+    path = pathlib.Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+def delete_prices(path):
+    path = pathlib.Path(path)
+    remove_files(path)
+    update_manifest(path.parent, {path.stem: None})
+
+def load_prices(path, memory_map=True):
+    # memory_map=False reads .npy files into memory, for frames kept around (charts) or held while their
+    # file is rewritten: Windows can't delete or replace a file that is still mapped.
+    path = pathlib.Path(path)
+    if path.suffix == ".csv":
+        df = pandas.read_csv(path, parse_dates=["Date"], index_col="Date")
+    else:
+        if path.suffix == ".chunks": # one table in memory; streaming.file_bars reads a chunk at a time instead
+            table = np.concatenate([np.load(file) for file in chunk_paths(path)], axis=1)
+        else:
+            table = np.load(path, mmap_mode="r" if memory_map else None)
+        dates = pandas.DatetimeIndex(table[0].astype(np.int64).astype("datetime64[s]"), name="Date")
+        # table[1:] is (columns, days) and C-ordered, which is how pandas lays out a float block,
+        # so the DataFrame wraps the memory map (or the array) instead of copying it.
+        df = pandas.DataFrame(table[1:].T, index=dates, columns=COLUMNS, copy=False)
+    # Ingested files are already clean. Anything else (older versions, files written by hand) gets deduplicated
+    # here, but only when it has to be: a boolean mask always copies.
+    if manifest_entry(path) is None and df.index.has_duplicates:
+        df = df[~df.index.duplicated(keep='first')]
+    return df
+
+def convert(path, storage_format):
+    # Rewrite one ticker's price file in another format, cleaned on the way. Returns the new path.
+    path = pathlib.Path(path)
+    new_path = price_path(path.parent, path.stem, storage_format)
+    if new_path != path:
+        ingest_prices(load_prices(path), new_path)
+        remove_files(path)
+    elif manifest_entry(path) is None: # same format, but never ingested: clean it in place
+        ingest_prices(load_prices(path, memory_map=False), path)
+    return new_path
+
+def migrate(data_folder, storage_format):
+    # One-shot conversion of every stored ticker to storage_format.
+    for path in stored_tickers(data_folder).values():
+        convert(path, storage_format)
@@ -0,0 +1,75 @@
+import pandas
+
+import indicators, result_cache
+from backtester import crossovers, simulate_signals, summarize, term_windows
+from storage import COLUMNS, load_prices
+
+# A strategy turns a ticker's prices into buy and sell signals, for every day at once.
+# Any object with these works:
+#   name -> str, unique per strategy and parameters (it's part of the result cache key)
+#   warmup -> int: nothing is bought on or before this day (the backtest's day `long`), so the
+#       indicators have a full window behind them
+#   signals(prices) -> (entries, exits): boolean arrays with one value per day, where prices is
+#       {"Close": array, "High": array, "Low": array, "Open": array, "Volume": array}
+# The engine does the rest, the same way for every strategy: buy on an entry day with the whole balance,
+# sell on the next exit day (or at the ATR stop, with risk control), slippage and 1 cent per share bought.
+
+class SMACrossover:
+    # The backtest's own rule: buy when the short SMA crosses above the long one, sell when it crosses below.
+
+    def __init__(self, short, long):
+        if not 0 < short < long:
+            raise Exception("INVALID WINDOWS")
+        self.short, self.long = short, long
+        self.name = f"sma-{short}-{long}"
+        self.warmup = long
+
+    def signals(self, prices):
+        close = pandas.Series(prices["Close"])
+        return crossovers(close.rolling(self.short).mean().to_numpy(), close.rolling(self.long).mean().to_numpy())
+
+class EMACrossover:
+    # The same crossovers on Exponential Moving Averages: ema = alpha * close + (1 - alpha) * yesterday's ema,
+    # with alpha = 2 / (window + 1), starting from the first Close. An EMA counts from its window-th day.
+
+    def __init__(self, short, long):
+        if not 0 < short < long:
+            raise Exception("INVALID WINDOWS")
+        self.short, self.long = short, long
+        self.name = f"ema-{short}-{long}"
+        self.warmup = long
+
+    def signals(self, prices):
+        close = pandas.Series(prices["Close"])
+        shortEMA = close.ewm(span=self.short, adjust=False, min_periods=self.short).mean().to_numpy()
+        longEMA = close.ewm(span=self.long, adjust=False, min_periods=self.long).mean().to_numpy()
+        return crossovers(shortEMA, longEMA)
+
+STRATEGIES = {"sma": SMACrossover, "ema": EMACrossover}
+
+def strategy_for(name, term):
+    # A built-in strategy with the windows of a term (20 & 50 or 50 & 200).
+    if name not in STRATEGIES:
+        raise Exception("INVALID STRATEGY")
+    return STRATEGIES[name](*term_windows(term))
+
+def run_strategy(data_path, balance_allocated, strategy, risk_control, term=None, use_cache=True):
+    # Backtest any strategy. Returns (stats, list of (buy date, sell date)); stats are run_backtest's plus
+    # the strategy's name. Results are cached like run_backtest's.
+    key = result_cache.cache.key(data_path, balance_allocated, term, risk_control, f"strategy-{strategy.name}") if use_cache else None
+    cached = result_cache.cache.get(key) if key else None
+    if cached:
+        return cached
+
+    df = load_prices(data_path)
+    entries, exits = strategy.signals({column: df[column].to_numpy() for column in COLUMNS})
+    atr = indicators.cache.get(data_path, df, "atr") if risk_control else None
+    dynamic_balance, trades = simulate_signals(
+        df["Close"].to_numpy(), indicators.cache.get(data_path, df, "sa"), atr, entries, exits,
+        balance_allocated, risk_control, start=strategy.warmup
+    )
+    matchDate = [(df.index[buy], df.index[sell]) for buy, sell in trades]
+    stats = {"strategy": strategy.name, **summarize(df, matchDate, dynamic_balance, balance_allocated, term, risk_control)}
+    if key:
+        result_cache.cache.put(key, stats, matchDate)
+    return stats, matchDate
@@ -0,0 +1,221 @@
+import csv, datetime, math, pathlib
+
+import numpy as np
+import pandas
+
+from backtester import term_windows
+from storage import chunk_paths
+
+# Event-driven backtest: bars go in one at a time, from any iterable of
+# (date, close, high, low, open, volume) tuples in date order: a CSV replay (csv_bars), a stored
+# price file (npy_bars, chunk_bars), a generator or a live feed. Every indicator is a ring-buffer rolling sum, so memory
+# per ticker stays constant however long the history is. Decisions are the same as backtest's, bar for bar.
+
+nan = float("nan")
+
+def fmax(a, b):
+    # NumPy's fmax: a missing value loses to a number.
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a >= b else b
+
+def minimum(a, b):
+    # NumPy's minimum: a missing value wins.
+    if a != a or b != b:
+        return nan
+    return a if a <= b else b
+
+def divide(a, b):
+    # Division like NumPy's: x / 0 is +-inf and 0 / 0 is NaN, instead of an exception.
+    try:
+        return a / b
+    except ZeroDivisionError:
+        if a != a or a == 0:
+            return nan
+        return math.copysign(math.inf, a) * math.copysign(1, b)
+
+class RollingMean:
+    # Mean of the last `window` values, O(1) per value. Follows pandas' rolling().mean() step for step
+    # (compensated sums, NaNs left out but the window must be full of numbers), so the means are bit-for-bit
+    # the same as the backtester's and crossovers happen on exactly the same bars.
+
+    def __init__(self, window):
+        self.window = window
+        self.values = [nan] * window # ring buffer of the last `window` values
+        self.position = 0 # slot the next value goes in, which holds the value leaving the window
+        self.seen = 0
+        self.nobs = 0 # numbers (not NaN) in the window
+        self.negatives = 0
+        self.sum = 0.0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.same = 0 # how many of the latest numbers are equal to `previous`
+        self.previous = nan
+
+    def update(self, value):
+        # Add the next value and return the new mean (NaN until the window is full of numbers).
+        if self.seen >= self.window:
+            old = self.values[self.position]
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.remove_compensation
+                total = self.sum + y
+                self.remove_compensation = total - self.sum - y
+                self.sum = total
+                if math.copysign(1, old) < 0:
+                    self.negatives -= 1
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.window
+        self.seen += 1
+
+        if value == value:
+            self.nobs += 1
+            y = value - self.add_compensation
+            total = self.sum + y
+            self.add_compensation = total - self.sum - y
+            self.sum = total
+            if math.copysign(1, value) < 0:
+                self.negatives += 1
+            self.same = self.same + 1 if value == self.previous else 1
+            self.previous = value
+
+        if self.nobs < self.window:
+            return nan
+        if self.same >= self.nobs: # a window of one repeated value averages to exactly that value
+            return self.previous
+        mean = self.sum / self.nobs
+        if self.negatives == 0 and mean < 0:
+            return 0.0
+        if self.negatives == self.nobs and mean > 0:
+            return 0.0
+        return mean
+
+class StreamingBacktest:
+    # One ticker's backtest, fed a bar at a time with update(). Same rules as backtester.simulate_reference:
+    # the first `long` bars only warm the indicators up, nothing is bought on the bar after that, and a
+    # position still open when the bars run out is not counted.
+
+    def __init__(self, balance_allocated, term, risk_control):
+        self.term, self.risk_control, self.balance_allocated = term, risk_control, balance_allocated
+        self.short, self.long = term_windows(term)
+        self.shortSMA, self.longSMA = RollingMean(self.short), RollingMean(self.long)
+        self.atr = RollingMean(14)
+        self.avgVolume = RollingMean(30)
+
+        self.bars = 0
+        self.last_date = None
+        self.prev_close = nan
+        self.yesterday_shortSMA = self.yesterday_longSMA = nan
+        self.dynamic_balance = balance_allocated
+        self.buyDate = None
+        self.buyClose = self.buyPrice = self.buyVolume = None
+        self.trades = []
+        self.highest_win = self.highest_loss = 0
+
+    def update(self, date, close, high, low, open, volume):
+        # Returns "BUY" or "SELL" if this bar traded, otherwise None.
+        # A bar dated on or before the previous one is ignored, like the duplicate dates load_prices drops.
+        if self.last_date is not None and date <= self.last_date:
+            return None
+        self.last_date = date
+        bar = self.bars
+        self.bars += 1
+
+        today_shortSMA = self.shortSMA.update(close)
+        today_longSMA = self.longSMA.update(close)
+        # As indicators.atr: a missing High - Low makes the TR missing, a missing previous close (day 1) is skipped.
+        tr = high - low
+        if tr == tr:
+            tr = fmax(tr, fmax(abs(high - self.prev_close), abs(low - self.prev_close)))
+        atr = self.atr.update(tr)
+        avgVolume = self.avgVolume.update(volume)
+        self.prev_close = close
+
+        yesterday_shortSMA, yesterday_longSMA = self.yesterday_shortSMA, self.yesterday_longSMA
+        self.yesterday_shortSMA, self.yesterday_longSMA = today_shortSMA, today_longSMA
+        if bar <= self.long: # backtest starts at bar `long`, which only serves as the first yesterday
+            return None
+
+        # Slippage Adjustment, as in indicators.slippage (bar 30 onwards has a full average volume)
+        normVolume = fmax(divide(volume, avgVolume), 0.001)
+        sa = 0.1 * divide(high - low, close) / normVolume / 100
+        sa = fmax(minimum(sa, 0.05), 0.0005)
+
+        if self.buyDate is None and today_shortSMA >= today_longSMA and yesterday_shortSMA <= yesterday_longSMA:
+            buyPrice = close * (1 + sa) + 0.01
+            buyVolume = self.dynamic_balance // buyPrice
+            if buyVolume != 0:
+                self.buyDate, self.buyClose, self.buyPrice, self.buyVolume = date, close, buyPrice, buyVolume
+                return "BUY"
+
+        elif (
+            (self.buyDate is not None and self.risk_control and close <= (self.buyClose - (2 * atr)))
+            or (self.buyDate is not None and today_shortSMA <= today_longSMA and yesterday_shortSMA >= yesterday_longSMA)
+        ):
+            self.trades.append((pandas.Timestamp(self.buyDate), pandas.Timestamp(date)))
+            sellPrice = close * (1 - sa)
+            self.dynamic_balance += (sellPrice - self.buyPrice) * self.buyVolume
+            net_change_percent = ((close - self.buyClose) / self.buyClose) * 100
+            if net_change_percent == net_change_percent:
+                self.highest_win = max(self.highest_win, net_change_percent)
+                self.highest_loss = min(self.highest_loss, net_change_percent)
+            self.buyDate = None
+            return "SELL"
+
+        return None
+
+    def stats(self):
+        # The same stats as run_backtest, for the bars so far.
+        return {
+            "term": self.term,
+            "risk-control": self.risk_control,
+            "balance-allocated": self.balance_allocated,
+            "final-balance": self.dynamic_balance,
+            "net-change": (self.dynamic_balance / self.balance_allocated - 1) * 100,
+            "highest-win": self.highest_win,
+            "highest-loss": self.highest_loss
+        }
+
+def stream_backtest(bars, balance_allocated, term, risk_control, on_trade=None):
+    # Run a backtest over an iterable of bars. on_trade(event, date, engine) is called on every buy and sell.
+    # Returns (stats, list of (buy date, sell date)).
+    engine = StreamingBacktest(balance_allocated, term, risk_control)
+    for bar in bars:
+        event = engine.update(*bar)
+        if event and on_trade:
+            on_trade(event, bar[0], engine)
+    return engine.stats(), engine.trades
+
+def csv_bars(path):
+    # Replay a price CSV (a Date column plus Close/High/Low/Open/Volume, in any order) one line at a time.
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [header.index(column) for column in ["Date", "Close", "High", "Low", "Open", "Volume"]]
+        for row in reader:
+            date = datetime.datetime.fromisoformat(row[columns[0]])
+            yield (date, *(float(row[column]) if row[column] else nan for column in columns[1:]))
+
+def npy_bars(path, chunk=65536):
+    # Replay a stored .npy price file through its memory map, a chunk of days at a time.
+    table = np.load(path, mmap_mode="r")
+    for start in range(0, table.shape[1], chunk):
+        block = np.array(table[:, start:start + chunk])
+        dates = block[0].astype(np.int64).astype("datetime64[s]")
+        for day in range(block.shape[1]):
+            yield (dates[day], *block[1:, day].tolist())
+
+def chunk_bars(path):
+    # Replay a .chunks folder one chunk file at a time; the engine carries its rolling state across chunks.
+    for file in chunk_paths(path):
+        yield from npy_bars(file)
+
+def file_bars(path):
+    path = pathlib.Path(path)
+    if path.suffix == ".csv":
+        return csv_bars(path)
+    if path.suffix == ".chunks":
+        return chunk_bars(path)
+    return npy_bars(path)
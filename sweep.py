@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas
+
+import indicators
+from backtester import crossovers, simulate_signals
+from shared import SharedArrays, attach
+from storage import load_prices
+
+def rolling_means(close, windows):
+    # Every SMA in the grid from a single cumulative-sum pass:
+    # mean of days [i-w+1, i] = (csum[i+1] - csum[i+1-w]) / w. Like rolling(w).mean(), a window with a missing
+    # Close (or days before the first full window) is NaN; the sums skip missing values so one NaN only
+    # blanks the windows that contain it instead of everything after it.
+    missing = np.isnan(close)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, close))))
+    counts = np.concatenate(([0], np.cumsum(~missing)))
+    means = np.full((len(windows), len(close)), np.nan)
+    for row, window in enumerate(windows):
+        full = (counts[window:] - counts[:-window]) == window
+        means[row, window - 1:] = np.where(full, (csum[window:] - csum[:-window]) / window, np.nan)
+    return means
+
+def sweep_worker(job):
+    # Evaluates one chunk of window pairs. Crossovers for the whole chunk are found in one 2D pass,
+    # then each pair is simulated from its own start day (day `long`, same as backtest's df[long:],
+    # where the first day has no yesterday and so can't be a signal day).
+    # arrays holds close, sa, atr and the SMA of every window (one row each); in a pool it's the handle
+    # of a shared-memory block instead, so the job itself stays a few hundred bytes.
+    arrays, pairs, balance_allocated, risk_control = job
+    if not isinstance(arrays, dict):
+        arrays = attach(arrays)
+    close, sa, atr, means = arrays["close"], arrays["sa"], arrays.get("atr"), arrays["means"]
+    row_of = arrays["meta"]
+    crossUp, crossDown = crossovers(means[[row_of[short] for short, _ in pairs]], means[[row_of[long] for _, long in pairs]])
+    results = []
+    for row, (short, long) in enumerate(pairs):
+        final_balance, trades = simulate_signals(
+            close, sa, atr, crossUp[row], crossDown[row], balance_allocated, risk_control, start=long)
+        results.append({
+            "short": short,
+            "long": long,
+            "final-balance": final_balance,
+            "net-change": (final_balance / balance_allocated - 1) * 100,
+            "trades": len(trades)
+        })
+    return results
+
+def sweep(data_path, balance_allocated, risk_control, shorts, longs, workers=1, chunk=256):
+    # Backtest every (short, long) window pair with short < long on one ticker.
+    # The price data is loaded and the SMAs, ATR and SA are computed once for the whole grid.
+    # Returns a DataFrame ranked by net change (rank 1 = best).
+    df = load_prices(data_path)
+    close = df["Close"].to_numpy()
+    sa = indicators.cache.get(data_path, df, "sa")
+    atr = indicators.cache.get(data_path, df, "atr") if risk_control else None
+
+    pairs = [(short, long) for short in shorts for long in longs if short < long and long < len(close)]
+    if not pairs:
+        raise Exception("NO VALID WINDOW PAIRS")
+
+    windows = sorted({window for pair in pairs for window in pair})
+    arrays = {"close": close, "sa": sa, "means": rolling_means(close, windows)}
+    if atr is not None:
+        arrays["atr"] = atr
+    row_of = {window: row for row, window in enumerate(windows)}
+    chunks = [pairs[i:i + chunk] for i in range(0, len(pairs), chunk)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        arrays["meta"] = row_of
+        results = [sweep_worker((arrays, chunk_pairs, balance_allocated, risk_control)) for chunk_pairs in chunks]
+    else:
+        with SharedArrays(arrays, meta=row_of) as block, ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [(block.handle, chunk_pairs, balance_allocated, risk_control) for chunk_pairs in chunks]
+            results = list(pool.map(sweep_worker, jobs))
+
+    ranked = pandas.DataFrame([row for rows in results for row in rows])
+    ranked = ranked.sort_values("net-change", ascending=False, kind="stable").reset_index(drop=True)
+    ranked.index = pandas.RangeIndex(1, len(ranked) + 1, name="rank")
+    return ranked
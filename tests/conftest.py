@@ -0,0 +1,36 @@
+import pathlib, sys
+
+import numpy as np
+import pandas
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent)) # the modules live at the top of the repo
+
+import storage
+
+def make_prices(days=1260, seed=0, nan_closes=0, nan_highs=0, zero_volume=False):
+    # A random-walk ticker in the stored layout. nan_closes / nan_highs put that many NaNs at random days
+    # (ingest keeps rows that are only partly empty); zero_volume adds stretches with no volume.
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, days)))
+    high = close * (1 + np.abs(rng.normal(0, 0.01, days)))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, days)))
+    volume = rng.integers(1, 5_000_000, days).astype(float)
+    if zero_volume:
+        for start in rng.integers(0, days - 40, 3):
+            volume[start:start + 35] = 0
+    close[rng.choice(np.arange(250, days), nan_closes, replace=False)] = np.nan
+    high[rng.choice(np.arange(250, days), nan_highs, replace=False)] = np.nan
+    return pandas.DataFrame(
+        {"Close": close, "High": high, "Low": low, "Open": (high + low) / 2, "Volume": volume},
+        index=pandas.bdate_range("2015-01-01", periods=days, name="Date")
+    )
+
+@pytest.fixture
+def price_file(tmp_path):
+    # price_file(df, ticker="T") -> path of df saved as a stored .npy price file
+    def save(df, ticker="T"):
+        path = tmp_path / f"{ticker}.npy"
+        storage.save_prices(df, path)
+        return path
+    return save
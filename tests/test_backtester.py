@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import storage
+from backtester import run_backtest
+from conftest import make_prices
+
+SETTINGS = [("short", True), ("short", False), ("long", True), ("long", False)]
+
+@pytest.mark.parametrize("term, risk_control", SETTINGS)
+@pytest.mark.parametrize("seed, nan_closes, zero_volume", [(0, 0, False), (1, 2, False), (2, 0, True), (3, 3, True)])
+def test_vectorized_engine_matches_reference(price_file, term, risk_control, seed, nan_closes, zero_volume):
+    path = price_file(make_prices(seed=seed, nan_closes=nan_closes, zero_volume=zero_volume))
+    reference, reference_chart = run_backtest(path, 1000, term, risk_control, engine="reference", use_cache=False)
+    vectorized, vectorized_chart = run_backtest(path, 1000, term, risk_control, engine="vectorized", use_cache=False)
+    assert vectorized_chart["trades"] == reference_chart["trades"]
+    assert vectorized == pytest.approx(reference, rel=1e-12)
+
+def memory_mapped(array):
+    # True if array is (a view of) a memory-mapped file
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+def test_chart_prices_are_not_memory_mapped(price_file):
+    # Windows can't replace or delete a file while it is mapped, and a chart window keeps its prices
+    path = price_file(make_prices(seed=4))
+    assert memory_mapped(storage.load_prices(path)["Close"].to_numpy())
+    _, chart = run_backtest(path, 1000, "short", True, use_cache=False)
+    assert not any(memory_mapped(chart["prices"][column].to_numpy()) for column in chart["prices"])
@@ -0,0 +1,26 @@
+import json
+
+import cli, storage
+from conftest import make_prices
+
+def test_charts_prints_one_record_per_ticker_and_setting(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    storage.save_prices(make_prices(days=600, seed=1), tmp_path / "Data" / "AAA.npy")
+    assert cli.main(["charts", "--workers", "1", "--output", "charts"]) == 0
+    records = json.loads(capsys.readouterr().out)
+    assert [(record["ticker"], record["term"], record["risk-control"]) for record in records] == [
+        ("AAA", "short", True), ("AAA", "short", False), ("AAA", "long", True), ("AAA", "long", False)]
+    assert all(record["error"] is None and (tmp_path / "charts" / record["image"]).exists() for record in records)
+    assert (tmp_path / "charts" / "index.html").exists()
+
+def test_walkforward_folds_print_iso_dates(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Data").mkdir()
+    df = make_prices(days=600, seed=1)
+    storage.save_prices(df, tmp_path / "Data" / "AAA.npy")
+    assert cli.main(["walkforward", "AAA", "--train", "300", "--test", "100", "--workers", "1", "--folds"]) == 0
+    folds = json.loads(capsys.readouterr().out)
+    assert len(folds) == 3
+    assert folds["0"]["train-start"].startswith(df.index[0].strftime("%Y-%m-%dT"))
+    assert folds["2"]["test-end"].startswith(df.index[599].strftime("%Y-%m-%dT"))
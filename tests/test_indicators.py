@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import indicators
+from conftest import make_prices
+
+def old_indicators(df):
+    # findATR and findSA as they were before the column math: row-wise Python max/min.
+    df = df.copy()
+    df["Prev. Close"] = df["Close"].shift(1)
+    df["TR"] = df[["High", "Low", "Prev. Close"]].apply(
+        lambda row: max(
+            row["High"] - row["Low"],
+            abs(row["High"] - row["Prev. Close"]),
+            abs(row["Low"] - row["Prev. Close"])
+        ),
+        axis=1
+    )
+    df["ATR"] = df["TR"].rolling(14).mean()
+
+    df["Prop. Range"] = (df["High"] - df["Low"]) / df["Close"]
+    df["Avg. Volume"] = df["Volume"].rolling(30).mean()
+    df.loc[df.index[:29], "Avg. Volume"] = 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["Norm. Volume"] = df[["Volume", "Avg. Volume"]].apply(
+            lambda row: max(0.001, row["Volume"] / row["Avg. Volume"]), axis=1)
+    df["SA"] = df[["Prop. Range", "Norm. Volume"]].apply(
+        lambda row: 0.1 * row["Prop. Range"] / row["Norm. Volume"] / 100, axis=1)
+    df["SA"] = df["SA"].apply(lambda sa: max(0.0005, min(sa, 0.05)))
+    return df["ATR"].to_numpy(), df["SA"].to_numpy()
+
+@pytest.mark.parametrize("seed, nan_closes, nan_highs, zero_volume", [(0, 0, 0, False), (1, 3, 0, False), (2, 0, 3, True), (3, 2, 2, True)])
+def test_column_math_matches_row_wise_lambdas(seed, nan_closes, nan_highs, zero_volume):
+    df = make_prices(days=600, seed=seed, nan_closes=nan_closes, nan_highs=nan_highs, zero_volume=zero_volume)
+    old_atr, old_sa = old_indicators(df)
+    np.testing.assert_array_equal(indicators.atr(df), old_atr)
+    np.testing.assert_array_equal(indicators.slippage(df), old_sa)
+
+def test_missing_high_keeps_true_range_missing():
+    df = make_prices(days=300, seed=4)
+    df.iloc[100, df.columns.get_loc("High")] = np.nan
+    atr = indicators.atr(df)
+    assert np.isnan(atr[100:114]).all() and not np.isnan(atr[114])
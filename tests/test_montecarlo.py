@@ -0,0 +1,24 @@
+import pytest
+
+from backtester import run_backtest
+from conftest import make_prices
+from montecarlo import monte_carlo
+
+SETTINGS = [("short", True), ("short", False), ("long", True), ("long", False)]
+
+@pytest.mark.parametrize("term, risk_control", SETTINGS)
+@pytest.mark.parametrize("seed, nan_closes", [(0, 0), (1, 2)])
+def test_backtest_costs_give_the_backtest_balance(price_file, term, risk_control, seed, nan_closes):
+    # With the backtest's own cost model (bias 0.1, no noise, 1 cent per share) every scenario is the backtest.
+    path = price_file(make_prices(seed=seed, nan_closes=nan_closes))
+    expected, _ = run_backtest(path, 1000, term, risk_control, use_cache=False)
+    stats = monte_carlo(path, 1000, term, risk_control, scenarios=50, bias=(0.1, 0.1), noise=0, fee=(0.01, 0.01))
+    assert stats["backtest-final-balance"] == pytest.approx(expected["final-balance"], rel=1e-9)
+    assert stats["final-balance-min"] == pytest.approx(stats["backtest-final-balance"], rel=1e-9)
+    assert stats["final-balance-max"] == pytest.approx(stats["backtest-final-balance"], rel=1e-9)
+
+def test_seed_gives_the_same_scenarios(price_file):
+    path = price_file(make_prices(seed=2))
+    first = monte_carlo(path, 1000, "short", True, scenarios=500, seed=7)
+    assert monte_carlo(path, 1000, "short", True, scenarios=500, seed=7) == first
+    assert monte_carlo(path, 1000, "short", True, scenarios=500, seed=8) != first
@@ -0,0 +1,32 @@
+import pytest
+
+from backtester import run_backtest
+from conftest import make_prices
+from panel import build_panel, panel_crossovers, portfolio_backtest
+
+@pytest.mark.parametrize("term", ["short", "long"])
+@pytest.mark.parametrize("risk_control", [True, False])
+@pytest.mark.parametrize("seed, nan_closes", [(0, 0), (8, 2), (9, 4)])
+def test_one_ticker_one_position_matches_backtest(price_file, term, risk_control, seed, nan_closes):
+    path = price_file(make_prices(seed=seed, nan_closes=nan_closes))
+    expected, chart = run_backtest(path, 1000, term, risk_control, use_cache=False)
+    stats, equity, trades = portfolio_backtest({"T": path}, 1000, term, risk_control, max_positions=1)
+    assert list(zip(trades["buy-date"], trades["sell-date"])) == chart["trades"]
+    # backtest leaves out a position still open at the end; so does the cash the closed trades made
+    assert 1000 + trades["profit"].sum() == pytest.approx(expected["final-balance"], rel=1e-12)
+
+def test_crossovers_use_each_tickers_own_previous_bar(price_file):
+    # Two tickers on different calendars (gaps, missing closes): the panel's signals are each ticker's own.
+    first = make_prices(seed=1, nan_closes=3)
+    second = make_prices(seed=2, nan_closes=2).iloc[7:]
+    second = second.drop(second.index[::11])
+    paths = {"A": price_file(first, "A"), "B": price_file(second, "B")}
+    panel = build_panel(paths, "short", False)
+    crossUp, crossDown = panel_crossovers(panel)
+    for column, df in enumerate([first, second]):
+        short, long = df["Close"].rolling(20).mean(), df["Close"].rolling(50).mean()
+        up = (short >= long) & (short.shift(1) <= long.shift(1))
+        down = (short <= long) & (short.shift(1) >= long.shift(1))
+        rows = panel["dates"].get_indexer(df.index)
+        assert (crossUp[rows, column] == up.to_numpy()).all() and crossUp[:, column].sum() == up.sum()
+        assert (crossDown[rows, column] == down.to_numpy()).all() and crossDown[:, column].sum() == down.sum()
@@ -0,0 +1,30 @@
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from conftest import make_prices
+from shared import SharedArrays, attach
+from sweep import sweep
+
+def column_sum(job):
+    handle, column = job
+    arrays = attach(handle)
+    return float(arrays["prices"][:, column].sum()), arrays["prices"].flags.writeable, arrays["meta"]
+
+def test_workers_read_the_block_and_it_is_freed():
+    prices = np.random.default_rng(0).random((500, 8))
+    with SharedArrays({"prices": prices}, meta="info") as block:
+        name = block.memory.name
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(column_sum, [(block.handle, column) for column in range(8)]))
+    assert [total for total, _, _ in results] == pytest.approx(prices.sum(axis=0).tolist(), rel=1e-12)
+    assert all(not writeable and meta == "info" for _, writeable, meta in results)
+    assert not pathlib.Path("/dev/shm", name.lstrip("/")).exists()
+
+def test_sweep_on_a_pool_matches_one_process(price_file):
+    path = price_file(make_prices(seed=3, nan_closes=2))
+    alone = sweep(path, 1000, True, range(10, 60, 10), range(50, 250, 50), workers=1)
+    pooled = sweep(path, 1000, True, range(10, 60, 10), range(50, 250, 50), workers=2, chunk=4)
+    assert pooled.equals(alone)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import indicators, result_cache
+from backtester import run_backtest, simulate_reference, term_windows
+from conftest import make_prices
+from strategies import EMACrossover, SMACrossover, run_strategy
+
+SETTINGS = [("short", True), ("short", False), ("long", True), ("long", False)]
+
+def per_bar_ema(close, window):
+    # ema = alpha * close + (1 - alpha) * yesterday's ema, from the first Close, counted from the window-th day.
+    alpha = 2 / (window + 1)
+    ema, values = None, np.full(len(close), np.nan)
+    for day, price in enumerate(close):
+        if ema is None:
+            ema = price
+        elif price == price:
+            ema = alpha * price + (1 - alpha) * ema
+        if day >= window - 1 and price == price:
+            values[day] = ema
+    return values
+
+@pytest.mark.parametrize("term, risk_control", SETTINGS)
+@pytest.mark.parametrize("seed, nan_closes", [(0, 0), (1, 2)])
+def test_sma_plugin_matches_backtest(price_file, term, risk_control, seed, nan_closes):
+    path = price_file(make_prices(seed=seed, nan_closes=nan_closes))
+    expected, chart = run_backtest(path, 1000, term, risk_control, use_cache=False)
+    stats, trades = run_strategy(path, 1000, SMACrossover(*term_windows(term)), risk_control, term, use_cache=False)
+    assert stats.pop("strategy") == "sma-{}-{}".format(*term_windows(term))
+    assert stats == expected
+    assert trades == chart["trades"]
+
+@pytest.mark.parametrize("term, risk_control", SETTINGS)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_ema_plugin_matches_per_bar_ema(price_file, term, risk_control, seed):
+    df = make_prices(seed=seed)
+    path = price_file(df)
+    short, long = term_windows(term)
+    reference = df.copy()
+    reference["Short EMA"] = per_bar_ema(df["Close"].to_numpy(), short)
+    reference["Long EMA"] = per_bar_ema(df["Close"].to_numpy(), long)
+    reference["ATR"] = indicators.atr(df)
+    reference["SA"] = indicators.slippage(df)
+    expected_balance, expected_trades = simulate_reference(reference[long:], "Short EMA", "Long EMA", 1000, risk_control)
+
+    stats, trades = run_strategy(path, 1000, EMACrossover(short, long), risk_control, term, use_cache=False)
+    assert trades == expected_trades
+    assert stats["final-balance"] == pytest.approx(expected_balance, rel=1e-9)
+
+def test_cached_result_keeps_the_callers_term(price_file, tmp_path):
+    path = price_file(make_prices(seed=3))
+    result_cache.configure(folder=tmp_path / "results")
+    try:
+        untitled, _ = run_strategy(path, 1000, SMACrossover(20, 50), True)
+        titled, _ = run_strategy(path, 1000, SMACrossover(20, 50), True, "short")
+        again, _ = run_strategy(path, 1000, SMACrossover(20, 50), True, "short")
+    finally:
+        result_cache.configure(folder=None)
+    assert untitled["term"] is None and titled["term"] == again["term"] == "short"
+    assert result_cache.cache.hits >= 1
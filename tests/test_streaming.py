@@ -0,0 +1,14 @@
+import pytest
+
+from backtester import run_backtest
+from conftest import make_prices
+from streaming import file_bars, stream_backtest
+
+@pytest.mark.parametrize("term, risk_control", [("short", True), ("short", False), ("long", True), ("long", False)])
+@pytest.mark.parametrize("seed, nan_closes, nan_highs", [(0, 0, 0), (5, 2, 3)])
+def test_streaming_matches_backtest(price_file, term, risk_control, seed, nan_closes, nan_highs):
+    path = price_file(make_prices(seed=seed, nan_closes=nan_closes, nan_highs=nan_highs))
+    expected, chart = run_backtest(path, 1000, term, risk_control, use_cache=False)
+    stats, trades = stream_backtest(file_bars(path), 1000, term, risk_control)
+    assert stats == expected
+    assert trades == chart["trades"]
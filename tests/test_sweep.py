@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from backtester import run_backtest
+from conftest import make_prices
+from sweep import rolling_means, sweep
+
+def test_rolling_means_match_pandas_with_missing_closes():
+    close = make_prices(days=600, seed=7, nan_closes=4)["Close"]
+    means = rolling_means(close.to_numpy(), [5, 20, 50])
+    for row, window in enumerate([5, 20, 50]):
+        expected = close.rolling(window).mean().to_numpy()
+        np.testing.assert_array_equal(np.isnan(means[row]), np.isnan(expected))
+        np.testing.assert_allclose(means[row], expected, rtol=1e-12)
+
+@pytest.mark.parametrize("short, long, term", [(20, 50, "short"), (50, 200, "long")])
+@pytest.mark.parametrize("risk_control", [True, False])
+@pytest.mark.parametrize("seed, nan_closes", [(0, 0), (1, 2), (2, 5)])
+def test_sweep_matches_backtest(price_file, short, long, term, risk_control, seed, nan_closes):
+    path = price_file(make_prices(seed=seed, nan_closes=nan_closes))
+    expected, _ = run_backtest(path, 1000, term, risk_control, use_cache=False)
+    result = sweep(path, 1000, risk_control, [short], [long], workers=1).iloc[0]
+    assert result["final-balance"] == pytest.approx(expected["final-balance"], rel=1e-12)
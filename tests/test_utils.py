@@ -0,0 +1,148 @@
+import json, threading, time
+
+import pandas
+import pytest
+
+import providers, result_cache, utils
+from conftest import make_prices
+
+class SlowNames(providers.FixtureProvider):
+    # Fixture prices, with a company-name lookup that takes as long as a network round trip.
+    def __init__(self, folder, fail=()):
+        super().__init__(folder)
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.in_flight = self.most_in_flight = 0
+
+    def company_name(self, ticker):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        if ticker in self.fail:
+            raise Exception("NAME LOOKUP FAILED")
+        return f"{ticker} INC."
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch):
+    # Fixture CSVs for AAA..EEE in tmp_path/fx, and a fresh Data folder in tmp_path/app as the working folder.
+    folder = tmp_path / "fx"
+    folder.mkdir()
+    for seed, ticker in enumerate(["AAA", "BBB", "CCC", "DDD", "EEE"]):
+        make_prices(days=600, seed=seed).to_csv(folder / f"{ticker}.csv")
+    (folder / "names.json").write_text(json.dumps({"AAA": "AAA CORP."}))
+    (tmp_path / "app").mkdir()
+    monkeypatch.chdir(tmp_path / "app")
+    yield folder
+    utils.set_provider(None)
+
+def test_provider_set_before_init_is_kept(fixtures):
+    fixture_provider = providers.FixtureProvider(fixtures)
+    utils.set_provider(fixture_provider)
+    utils.init()
+    utils.load_libraries()
+    assert utils.provider is fixture_provider
+    assert utils.ticker_add_many(["AAA"]) == {"AAA": "ADDED"}
+    assert utils.tickerData["AAA"]["company-name"] == "AAA CORP."
+
+def test_company_names_are_fetched_concurrently(fixtures):
+    slow = SlowNames(fixtures, fail=("CCC",))
+    utils.set_provider(slow)
+    utils.init()
+    results = utils.ticker_add_many(["AAA", "BBB", "CCC", "DDD", "EEE"])
+    assert results == {"AAA": "ADDED", "BBB": "ADDED", "CCC": "NAME LOOKUP FAILED", "DDD": "ADDED", "EEE": "ADDED"}
+    assert slow.most_in_flight > 1
+    assert utils.tickerData["BBB"]["company-name"] == "BBB INC."
+    assert not utils.price_path("CCC").exists() # a failed ticker leaves nothing behind
+
+def test_reset_removes_daily_and_chunked_tickers(fixtures):
+    intraday = make_prices(days=600, seed=9)
+    intraday.index = intraday.index[0] + (intraday.index - intraday.index[0]) / 288 # 5-minute bars
+    intraday.rename_axis("Date").to_csv(fixtures / "MMM-5m.csv")
+    utils.set_provider(providers.FixtureProvider(fixtures))
+    utils.init()
+    assert utils.ticker_add_many(["AAA"]) == {"AAA": "ADDED"}
+    assert utils.ticker_add_many(["MMM"], interval="5m") == {"MMM": "ADDED"}
+    chunks = utils.price_path("MMM")
+    assert chunks.is_dir()
+
+    utils.reset_portfolio(5000)
+    assert not chunks.exists() and not utils.price_path("AAA").exists()
+    assert utils.tickerData == {} and utils.portfolio["balance"] == 5000
+    utils.init() # what was written to disk agrees
+    assert utils.tickerData == {} and utils.storage.read_manifest(utils.data_folder) == {}
+
+def stored(fixtures, ticker, days, interval="1d", scale=1.0):
+    # Write the fixture CSV with the first `days` bars of the ticker's history (prices times `scale`).
+    df = make_prices(days=600, seed=sum(map(ord, ticker)))
+    if interval != "1d": # 5-minute bars, the last 100 of them in the next month's chunk
+        df.index = pandas.Timestamp("2015-01-29 12:00") + (df.index - df.index[0]) / 288
+    df[["Close", "High", "Low", "Open"]] *= scale
+    name = f"{ticker}.csv" if interval == "1d" else f"{ticker}-{interval}.csv"
+    df[:days].rename_axis("Date").to_csv(fixtures / name)
+    return df[:days]
+
+def cache_keys(ticker):
+    # The indicator cache's hash of the ticker's prices and a result cache key (a cache of its own: whether the
+    # shared one is on depends on which tests ran before)
+    path = utils.price_path(ticker)
+    results = result_cache.ResultCache(folder=utils.data_folder / "cache" / "results")
+    return utils.indicators.content_hash(path), results.key(path, 1000, "short", True, "vectorized")
+
+def test_refresh_appends_new_bars(fixtures):
+    stored(fixtures, "AAA", 500)
+    utils.set_provider(providers.FixtureProvider(fixtures))
+    utils.init()
+    assert utils.ticker_add_many(["AAA"]) == {"AAA": "ADDED"}
+    keys = cache_keys("AAA")
+
+    full = stored(fixtures, "AAA", 600)
+    assert utils.ticker_refresh("AAA") == 100
+    assert utils.storage.read_manifest(utils.data_folder)["AAA"]["rows"] == 600
+    assert utils.storage.load_prices(utils.price_path("AAA"))["Close"].to_numpy() == pytest.approx(full["Close"].to_numpy())
+    new_keys = cache_keys("AAA")
+    assert new_keys[0] != keys[0] and new_keys[1] != keys[1] and None not in new_keys
+    assert utils.ticker_refresh("AAA") == 0 # nothing new
+
+def test_refresh_downloads_everything_again_after_a_readjustment(fixtures):
+    stored(fixtures, "AAA", 500)
+    utils.set_provider(providers.FixtureProvider(fixtures))
+    utils.init()
+    assert utils.ticker_add_many(["AAA"]) == {"AAA": "ADDED"}
+    keys = cache_keys("AAA")
+
+    adjusted = stored(fixtures, "AAA", 600, scale=0.5) # e.g. a 2:1 split: every stored Close moved
+    assert utils.ticker_refresh("AAA") == 100
+    assert utils.storage.read_manifest(utils.data_folder)["AAA"]["rows"] == 600
+    assert utils.storage.load_prices(utils.price_path("AAA"))["Close"].to_numpy() == pytest.approx(adjusted["Close"].to_numpy())
+    new_keys = cache_keys("AAA")
+    assert new_keys[0] != keys[0] and new_keys[1] != keys[1]
+
+def test_refresh_appends_to_chunked_tickers(fixtures):
+    stored(fixtures, "MMM", 500, interval="5m")
+    utils.set_provider(providers.FixtureProvider(fixtures))
+    utils.init()
+    assert utils.ticker_add_many(["MMM"], interval="5m") == {"MMM": "ADDED"}
+    keys = cache_keys("MMM")
+    assert len(utils.storage.chunk_paths(utils.price_path("MMM"))) == 1
+
+    full = stored(fixtures, "MMM", 600, interval="5m")
+    assert utils.ticker_refresh("MMM") == 100
+    assert utils.storage.read_manifest(utils.data_folder)["MMM"]["rows"] == 600
+    df = utils.storage.load_prices(utils.price_path("MMM"))
+    assert (df.index == full.index).all()
+    assert df["Close"].to_numpy() == pytest.approx(full["Close"].to_numpy())
+    assert len(utils.storage.chunk_paths(utils.price_path("MMM"))) == 2
+    assert cache_keys("MMM")[0] != keys[0]
+
+def test_refresh_all(fixtures):
+    stored(fixtures, "AAA", 500)
+    stored(fixtures, "BBB", 600)
+    utils.set_provider(providers.FixtureProvider(fixtures))
+    utils.init()
+    assert utils.ticker_add_many(["AAA", "BBB"]) == {"AAA": "ADDED", "BBB": "ADDED"}
+    stored(fixtures, "AAA", 600)
+    assert utils.ticker_refresh_all() == {"AAA": 100, "BBB": 0}
+    assert utils.storage.read_manifest(utils.data_folder)["AAA"]["rows"] == 600
@@ -0,0 +1,32 @@
+import pytest
+
+from backtester import run_backtest
+from conftest import make_prices
+from walkforward import walk_forward
+
+def backtest_window(df, first, last, long, balance, term, risk_control, price_file):
+    # run_backtest on days [first, last): the file starts `long` days earlier (or at day 0), so the SMAs are
+    # warm by `first`, which then only serves as the first yesterday, as in walk_forward.
+    path = price_file(df.iloc[max(first - long, 0):last], f"W{first}")
+    stats, _ = run_backtest(path, balance, term, risk_control, use_cache=False)
+    return stats["final-balance"]
+
+@pytest.mark.parametrize("short, long, term", [(20, 50, "short"), (50, 200, "long")])
+@pytest.mark.parametrize("risk_control", [True, False])
+@pytest.mark.parametrize("seed, nan_closes", [(0, 0), (1, 3)])
+def test_folds_match_backtest(price_file, short, long, term, risk_control, seed, nan_closes):
+    df = make_prices(seed=seed, nan_closes=nan_closes)
+    path = price_file(df)
+    train, test = 400, 200
+    stats, folds = walk_forward(path, 1000, [short], [long], train, test, risk_controls=(risk_control,))
+    assert len(folds) == (len(df) - train - test) // test + 1
+
+    balance = 1000
+    for fold, row in folds.iterrows():
+        start = fold * test
+        assert (row["short"], row["long"], row["risk-control"]) == (short, long, risk_control)
+        in_sample = backtest_window(df, start, start + train, long, 1000, term, risk_control, price_file)
+        assert row["train-net-change"] == pytest.approx((in_sample / 1000 - 1) * 100, rel=1e-9, abs=1e-9)
+        balance = backtest_window(df, start + train, start + train + test, long, balance, term, risk_control, price_file)
+        assert row["balance"] == pytest.approx(balance, rel=1e-9)
+    assert stats["final-balance"] == pytest.approx(balance, rel=1e-9)
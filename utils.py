@@ -1,104 +1,263 @@
 _libs = {}
+provider = None # set_provider's, kept across init(); Yahoo if it was never called, created by load_libraries
 
-def save_tickerData(tickerData):
-    with open(ticker_data_path, 'w') as f:
-        json.dump(tickerData, f, indent=2)
+# Bar intervals a ticker can be added with, and the history downloaded when no period is given
+# (the longest Yahoo Finance serves for each). Intraday tickers are stored chunked by month.
+INTERVALS = {"1d": "5y", "1h": "730d", "5m": "60d", "1m": "7d"}
+
+# tickerData and portfolio are kept in memory for fast reads; every change is also written to the
+# database. Write inside `with db:` so related changes are committed together, or not at all.
+def save_ticker(ticker):
+    database.save_ticker(db, ticker, tickerData[ticker])
 
 def save_portfolio(portfolio):
-    with open(portfolio_path, 'w') as f:
-        json.dump(portfolio, f, indent=2)
+    database.save_portfolio(db, portfolio)
+
+def save_config(config):
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+def price_path(ticker, interval=None):
+    # Daily prices are stored in the configured format, intraday ones always chunked.
+    interval = interval or (tickerData.get(ticker) or {}).get("interval") or "1d"
+    return storage.price_path(data_folder, ticker, config["storage-format"] if interval == "1d" else "chunks")
+
+def set_provider(new_provider):
+    # e.g. providers.FixtureProvider("fixtures") to run without network access
+    global provider
+    provider = new_provider
+
+def check_history(df):
+    if df.empty:
+        raise Exception(f"NO DATA FOUND")
+    # I set the minimum to 2 years (= ~500 trading days). TEST TICKER: ZONE
+    # Intraday tickers need the same number of bars: enough for the 200-bar SMA and then some trading.
+    if len(df) < 500:
+        raise Exception(f"NOT ENOUGH DATA")
+
+def check_interval(interval):
+    if interval not in INTERVALS:
+        raise Exception("INVALID INTERVAL")
+
+def new_tickerData(companyName, interval="1d"):
+    return {
+        "company-name": companyName,
+        "backtested": False,
+        "term": None,
+        "risk-control": None,
+        "balance-allocated": None,
+        "final-balance": None,
+        "net-change": None,
+        "highest-win": None,
+        "highest-loss": None,
+        "interval": interval
+    }
 
 def init():
-    # import libraries dynamically and assign global references to them for top-level access.
+    # Only what the window needs to show the stored portfolio: the standard library and the database.
+    # pandas, NumPy, the backtester etc. are imported by load_libraries, on first use or from a background warm-up.
     import importlib
-    for lib in ["os", "json", "pathlib", "pandas", "yfinance", "backtester"]:
+    started = importlib.import_module("time").perf_counter()
+    for lib in ["os", "json", "time", "pathlib", "threading", "concurrent.futures", "database"]:
         _libs[lib] = importlib.import_module(lib)
 
-    global os, json, pl, pd, yf, backtest
+    global os, json, time, pl, threading, futures, database, libraries_lock, startup_timings
     os = _libs["os"]
     json = _libs["json"]
+    time = _libs["time"]
     pl = _libs["pathlib"]
-    pd = _libs["pandas"]
-    yf = _libs["yfinance"]
-    backtest = _libs["backtester"].backtest
+    threading = _libs["threading"]
+    futures = _libs["concurrent.futures"]
+    database = _libs["database"]
+    libraries_lock = threading.Lock()
+    startup_timings = {}
 
-    global data_folder, ticker_data_path, tickerData, portfolio_path, portfolio
+    global data_folder, db, tickerData, portfolio, config_path, config
     data_folder = pl.Path("Data")
     os.makedirs(data_folder, exist_ok=True)
 
-    ticker_data_path = data_folder / "tickerdata.json"
-    if not ticker_data_path.exists():
-        save_tickerData({})
-    with open(ticker_data_path, 'r') as f:
-        tickerData = json.load(f)
+    config_path = data_folder / "config.json"
+    if not config_path.exists():
+        # First start with a config: move any CSVs from older versions to the binary store (one-shot).
+        config = {"storage-format": "npy", "indicator-cache": "memory", "result-cache": True, "result-cache-mb": 64}
+        if any(file.suffix == ".csv" for file in data_folder.iterdir()):
+            load_libraries()
+            storage.migrate(data_folder, config["storage-format"])
+        save_config(config)
+    with open(config_path, 'r') as f:
+        config = json.load(f)
 
-    portfolio_path = data_folder / "portfolio.json"
-    if not portfolio_path.exists():
+    db_path = data_folder / "portfolio.db"
+    is_new_db = not db_path.exists()
+    db = database.connect(db_path)
+    if is_new_db: # one-shot import from the JSON files older versions used
+        database.migrate_json(db, data_folder / "tickerdata.json", data_folder / "portfolio.json")
+    tickerData = database.load_tickers(db)
+    portfolio = database.load_portfolio(db)
+    if portfolio is None:
         portfolio = {"balance": 10000, "initial-balance": 10000, "net": 0}
-        save_portfolio(portfolio)
-    with open(portfolio_path, 'r') as f:
-        portfolio = json.load(f)
+        with db:
+            save_portfolio(portfolio)
+    startup_timings["init"] = time.perf_counter() - started
+
+def load_libraries():
+    # Import the heavy libraries and assign global references to them. Every function below that needs
+    # them calls this first; it's cheap once they're loaded and safe to call from any thread.
+    with libraries_lock:
+        if "pandas" in _libs:
+            return
+        import importlib
+        started = time.perf_counter()
+        for lib in ["pandas", "indicators", "result_cache", "backtester", "sweep", "storage", "providers", "report", "panel", "walkforward", "montecarlo", "strategies"]:
+            _libs[lib] = importlib.import_module(lib)
+
+        global pd, indicators, result_cache, run_backtest, plot_backtest, log_timings, backtest_batch, sweep, storage, providers, render_report, portfolio_backtest, walk_forward, monte_carlo, strategies, provider
+        pd = _libs["pandas"]
+        indicators = _libs["indicators"]
+        result_cache = _libs["result_cache"]
+        run_backtest = _libs["backtester"].run_backtest
+        plot_backtest = _libs["backtester"].plot_backtest
+        log_timings = _libs["backtester"].log_timings
+        backtest_batch = _libs["backtester"].backtest_batch
+        sweep = _libs["sweep"].sweep
+        storage = _libs["storage"]
+        providers = _libs["providers"]
+        render_report = _libs["report"].render_report
+        portfolio_backtest = _libs["panel"].portfolio_backtest
+        walk_forward = _libs["walkforward"].walk_forward
+        monte_carlo = _libs["montecarlo"].monte_carlo
+        strategies = _libs["strategies"]
+        if provider is None:
+            provider = providers.YahooProvider()
+        # "memory" (default) or "disk": also keep computed indicators in Data/cache/indicators between runs
+        indicators.configure(folder=data_folder / "cache" / "indicators" if config.get("indicator-cache") == "disk" else None)
+        # finished backtests in Data/cache/results, unless "result-cache" is false; "result-cache-mb" caps its size
+        result_cache.configure(
+            folder=data_folder / "cache" / "results" if config.get("result-cache", True) else None,
+            max_bytes=int(config.get("result-cache-mb", 64) * 2**20)
+        )
+        startup_timings["libraries"] = time.perf_counter() - started
+
+def warm_up():
+    # Preload in the background what the first download, backtest and plot will need, so the user doesn't wait
+    # on imports. pyplot itself is left to the main thread (it picks the GUI backend); matplotlib.figure is most of it.
+    import importlib
+    started = time.perf_counter()
+    load_libraries()
+    _libs["matplotlib.figure"] = importlib.import_module("matplotlib.figure")
+    startup_timings["warm-up"] = time.perf_counter() - started
+
+def startup_report():
+    # Seconds spent in each startup phase so far, e.g. {"init": 0.004, "libraries": 0.9, "warm-up": 1.2}
+    return dict(startup_timings)
 
-def ticker_add(ticker):
+def ticker_add(ticker, interval="1d", period=None):
+    ticker_store(*ticker_fetch(ticker, interval, period))
+
+# ticker_add in two halves, so the GUI can download on a worker thread (ticker_fetch changes nothing)
+# and store on the main thread (ticker_store), or drop the download if the user cancels.
+def ticker_fetch(ticker, interval="1d", period=None):
+    load_libraries()
     ticker = ticker.upper()
     if ticker == '' or ' ' in ticker:
         raise Exception("INVALID TICKER")
+    check_interval(interval)
 
-    csv_path = data_folder / f"{ticker}.csv"
-    if csv_path.exists():
+    if ticker in tickerData or price_path(ticker, interval).exists():
         raise Exception("ALREADY IN MEMORY")
-    
-    # Sometimes the DataFrame downloaded from yfinance is multiindexed.
-    # To circumvent this, we force multiindexing by inputting the ticker as a list.
-    # Then, we can slice the DataFrame.
-    df = yf.download([ticker], period='5y', interval='1d', auto_adjust=True)
-    if df.empty:
-        raise Exception(f"NO DATA FOUND")
-    if len(df) < 500: # I set the minimum to 2 years (= ~500 trading days). TEST TICKER: ZONE
-        raise Exception(f"NOT ENOUGH DATA")
-    df = df.xs(ticker, level="Ticker", axis=1)
-    df.to_csv(csv_path)
 
-    ticker_info = yf.Ticker(ticker).get_info()
-    # Sometimes the company name is missing.
-    companyName = (ticker_info.get("longName") or ticker_info.get("shortName") or "UNKNOWN COMPANY")
+    df = provider.download([ticker], period=period or INTERVALS[interval], interval=interval)[ticker]
+    check_history(df)
+    return ticker, df, provider.company_name(ticker), interval
 
-    tickerData[ticker] = {
-        "company-name": companyName,
-        "backtested": False,
-        "term": None,
-        "risk-control": None,
-        "balance-allocated": None,
-        "final-balance": None,
-        "net-change": None,
-        "highest-win": None,
-        "highest-loss": None
-    }
-    save_tickerData(tickerData)
+def ticker_store(ticker, df, companyName, interval="1d"):
+    load_libraries()
+    storage.ingest_prices(df, price_path(ticker, interval))
+    tickerData[ticker] = new_tickerData(companyName, interval)
+    with db:
+        save_ticker(ticker)
+
+def ticker_add_many(tickers, batch_size=50, workers=4, interval="1d", period=None):
+    # Add many tickers with one download per batch of tickers, at most `workers` batches in flight.
+    # Returns {ticker: "ADDED" or the error message}; one bad ticker doesn't stop the others.
+    load_libraries()
+    check_interval(interval)
+    results, pending = {}, []
+    for ticker in dict.fromkeys(ticker.upper() for ticker in tickers): # de-duplicated, order kept
+        if ticker == '' or ' ' in ticker:
+            results[ticker] = "INVALID TICKER"
+        elif ticker in tickerData or price_path(ticker, interval).exists():
+            results[ticker] = "ALREADY IN MEMORY"
+        else:
+            pending.append(ticker)
+
+    def add_batch(batch):
+        outcomes = {}
+        try:
+            frames = provider.download(batch, period=period or INTERVALS[interval], interval=interval)
+        except Exception as e:
+            return {ticker: str(e) for ticker in batch}
+        valid = []
+        for ticker in batch:
+            try:
+                check_history(frames[ticker])
+                valid.append(ticker)
+            except Exception as e:
+                outcomes[ticker] = str(e)
+        names = providers.company_names(provider, valid) # one request per name with Yahoo, so all at once
+        for ticker in valid:
+            try:
+                if isinstance(names[ticker], Exception):
+                    raise names[ticker]
+                entry = storage.ingest_prices(frames[ticker], price_path(ticker, interval), record=False)
+                outcomes[ticker] = (new_tickerData(names[ticker], interval), entry)
+            except Exception as e:
+                outcomes[ticker] = str(e)
+        return outcomes
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool, db: # one transaction for the whole batch
+        for outcomes in pool.map(add_batch, batches):
+            manifest_entries = {}
+            for ticker, outcome in outcomes.items():
+                if isinstance(outcome, tuple):
+                    tickerData[ticker], manifest_entries[ticker] = outcome
+                    save_ticker(ticker)
+                    results[ticker] = "ADDED"
+                else:
+                    results[ticker] = outcome
+            storage.update_manifest(data_folder, manifest_entries) # one manifest write per batch
+
+    return results
 
 def ticker_remove(ticker):
+    load_libraries()
     ticker = ticker.upper()
     if ticker == '' or ' ' in ticker:
         raise Exception("INVALID TICKER")
 
-    csv_path = data_folder / f"{ticker}.csv"
-    if not csv_path.exists():
+    data_path = price_path(ticker)
+    if not data_path.exists():
         raise Exception("NOT IN MEMORY")
 
-    csv_path.unlink()
+    storage.delete_prices(data_path)
+    indicators.cache.forget(data_path)
     inputTickerData = tickerData.pop(ticker)
-    save_tickerData(tickerData)
-
-    if inputTickerData["backtested"]:
-        net = inputTickerData["final-balance"] - inputTickerData["balance-allocated"]
-        portfolio["balance"] -= net
-        save_portfolio(portfolio)
+    with db: # the ticker's row and the reverted balance change together
+        database.delete_ticker(db, ticker)
+        if inputTickerData["backtested"]:
+            net = inputTickerData["final-balance"] - inputTickerData["balance-allocated"]
+            portfolio["balance"] -= net
+            save_portfolio(portfolio)
 
 def reset_portfolio(newBalance=None):
-    for file in data_folder.iterdir():
-        file.unlink()
+    load_libraries()
+    stored = storage.stored_tickers(data_folder)
+    for data_path in stored.values():
+        storage.remove_files(data_path) # a file, or a folder of chunks for intraday tickers
+        indicators.cache.forget(data_path)
+    storage.update_manifest(data_folder, dict.fromkeys(stored)) # None removes each entry
     tickerData.clear()
-    save_tickerData(tickerData)
     if not newBalance:
         portfolio["balance"] = portfolio["initial-balance"]
         portfolio["net"] = 0
@@ -106,19 +265,36 @@ def reset_portfolio(newBalance=None):
         portfolio["initial-balance"] = newBalance
         portfolio["balance"] = newBalance
         portfolio["net"] = 0
-    save_portfolio(portfolio)
+    with db:
+        database.delete_all_tickers(db)
+        save_portfolio(portfolio)
+
+def ticker_backtest(ticker, balance_allocated, term, risk_control, plot=True, timings=False, use_cache=True):
+    stats, chart = ticker_backtest_run(ticker, balance_allocated, term, risk_control, timings, use_cache, with_chart=plot)
+    ticker_backtest_apply(ticker, stats)
+    if plot:
+        started = time.perf_counter()
+        plot_backtest(ticker, term, risk_control, chart)
+        if timings:
+            stats["timings"]["plot"] = time.perf_counter() - started
+    return stats
 
-def ticker_backtest(ticker, balance_allocated, term, risk_control):
+# ticker_backtest in two halves, like ticker_fetch / ticker_store:
+# ticker_backtest_run is safe on a worker thread, ticker_backtest_apply updates the portfolio.
+def ticker_backtest_run(ticker, balance_allocated, term, risk_control, timings=False, use_cache=True, with_chart=True):
+    load_libraries()
     ticker = ticker.upper()
     if ticker == '' or ' ' in ticker:
         raise Exception("INVALID TICKER")
 
-    csv_path = data_folder / f"{ticker}.csv"
-    if not csv_path.exists():
+    data_path = price_path(ticker)
+    if not data_path.exists():
         raise Exception("NOT IN MEMORY")
 
-    stats = backtest(ticker, csv_path, balance_allocated, term, risk_control)
+    return run_backtest(data_path, balance_allocated, term, risk_control, timings=timings, use_cache=use_cache, with_chart=with_chart)
 
+def ticker_backtest_apply(ticker, stats):
+    ticker = ticker.upper()
     net = stats["final-balance"] - stats["balance-allocated"]
     portfolio["balance"] = round(portfolio["balance"] + net, 3)
     tickerData[ticker]["backtested"] = True
@@ -129,5 +305,166 @@ def ticker_backtest(ticker, balance_allocated, term, risk_control):
     tickerData[ticker]["net-change"] = stats["net-change"]
     tickerData[ticker]["highest-win"] = stats["highest-win"]
     tickerData[ticker]["highest-loss"] = stats["highest-loss"]
-    save_portfolio(portfolio)
-    save_tickerData(tickerData)
\ No newline at end of file
+    with db: # the ticker's results and the portfolio balance they changed are committed together
+        save_ticker(ticker)
+        save_portfolio(portfolio)
+
+def ticker_backtest_batch(balance_allocated, term, risk_control, tickers=None, workers=None, timings=False, use_cache=True):
+    # Research run over the stored universe: nothing is plotted and the portfolio is left untouched.
+    load_libraries()
+    if tickers is not None:
+        tickers = [ticker.upper() for ticker in tickers]
+        for ticker in tickers:
+            if not price_path(ticker).exists():
+                raise Exception(f"{ticker} NOT IN MEMORY")
+
+    return backtest_batch(data_folder, balance_allocated, term, risk_control, tickers, workers, timings, use_cache)
+
+def ticker_portfolio_backtest(balance_allocated, term, risk_control, tickers=None, allocation="equal", max_positions=20, fraction=0.1):
+    # All stored daily tickers (or the given ones) traded together from one shared balance. Research only,
+    # like the batch: the portfolio and each ticker's own backtest results are left untouched.
+    load_libraries()
+    paths = {
+        ticker: data_path for ticker, data_path in storage.stored_tickers(data_folder).items()
+        if ((tickerData.get(ticker) or {}).get("interval") or "1d") == "1d"
+    }
+    if tickers is not None:
+        tickers = [ticker.upper() for ticker in tickers]
+        for ticker in tickers:
+            if ticker not in paths:
+                raise Exception(f"{ticker} NOT IN MEMORY")
+        paths = {ticker: paths[ticker] for ticker in tickers}
+    if not paths:
+        raise Exception("NO TICKERS IN MEMORY")
+    return portfolio_backtest(paths, balance_allocated, term, risk_control, allocation, max_positions, fraction)
+
+def ticker_sweep(ticker, balance_allocated, risk_control, shorts=range(5, 105, 5), longs=range(20, 310, 10), workers=None):
+    load_libraries()
+    ticker = ticker.upper()
+    if ticker == '' or ' ' in ticker:
+        raise Exception("INVALID TICKER")
+
+    data_path = price_path(ticker)
+    if not data_path.exists():
+        raise Exception("NOT IN MEMORY")
+
+    return sweep(data_path, balance_allocated, risk_control, shorts, longs, workers)
+
+def ticker_walk_forward(ticker, balance_allocated, train=504, test=126, shorts=range(5, 105, 5), longs=range(20, 310, 10), workers=None):
+    # Out-of-sample check of the SMA strategy on one ticker; like the sweep, the portfolio is left untouched.
+    load_libraries()
+    ticker = ticker.upper()
+    if ticker == '' or ' ' in ticker:
+        raise Exception("INVALID TICKER")
+
+    data_path = price_path(ticker)
+    if not data_path.exists():
+        raise Exception("NOT IN MEMORY")
+
+    return walk_forward(data_path, balance_allocated, shorts, longs, train, test, workers=workers)
+
+def ticker_strategy_backtest(ticker, balance_allocated, term, risk_control, strategy="ema", use_cache=True):
+    # Backtest a ticker with one of strategies.STRATEGIES at the term's windows. Research only, like the batch:
+    # the portfolio and the ticker's own (SMA) backtest results are left untouched.
+    load_libraries()
+    ticker = ticker.upper()
+    if ticker == '' or ' ' in ticker:
+        raise Exception("INVALID TICKER")
+
+    data_path = price_path(ticker)
+    if not data_path.exists():
+        raise Exception("NOT IN MEMORY")
+
+    stats, trades = strategies.run_strategy(data_path, balance_allocated, strategies.strategy_for(strategy, term), risk_control, term, use_cache)
+    return stats
+
+def ticker_monte_carlo(ticker, balance_allocated, term, risk_control, scenarios=10000, seed=None):
+    # The ticker's backtest re-priced under random slippage and fees; the portfolio is left untouched.
+    load_libraries()
+    ticker = ticker.upper()
+    if ticker == '' or ' ' in ticker:
+        raise Exception("INVALID TICKER")
+
+    data_path = price_path(ticker)
+    if not data_path.exists():
+        raise Exception("NOT IN MEMORY")
+
+    return monte_carlo(data_path, balance_allocated, term, risk_control, scenarios, seed=seed)
+
+def set_storage_format(storage_format):
+    # Converts every stored daily ticker, so price data is never split across formats (intraday tickers stay chunked).
+    load_libraries()
+    if storage_format not in storage.FORMATS:
+        raise Exception("INVALID STORAGE FORMAT")
+    for ticker, data_path in storage.stored_tickers(data_folder).items():
+        if ((tickerData.get(ticker) or {}).get("interval") or "1d") == "1d":
+            storage.convert(data_path, storage_format)
+    config["storage-format"] = storage_format
+    save_config(config)
+
+def ticker_export_csv(ticker, export_path):
+    load_libraries()
+    ticker = ticker.upper()
+    if ticker == '' or ' ' in ticker:
+        raise Exception("INVALID TICKER")
+
+    data_path = price_path(ticker)
+    if not data_path.exists():
+        raise Exception("NOT IN MEMORY")
+
+    storage.save_prices(storage.load_prices(data_path), pl.Path(export_path).with_suffix(".csv"))
+
+def ticker_refresh(ticker):
+    # Fetch only the bars after the last stored date and append them. Returns how many were added.
+    load_libraries()
+    ticker = ticker.upper()
+    if ticker == '' or ' ' in ticker:
+        raise Exception("INVALID TICKER")
+
+    data_path = price_path(ticker)
+    if not data_path.exists():
+        raise Exception("NOT IN MEMORY")
+
+    # Chunked (intraday) data: only the last chunk is needed to compare and append. Not memory-mapped: the
+    # file is rewritten below while df is still alive.
+    df = storage.load_prices(storage.chunk_paths(data_path)[-1] if data_path.suffix == ".chunks" else data_path, memory_map=False)
+    last_date = df.index[-1]
+    interval = (tickerData.get(ticker) or {}).get("interval") or "1d"
+
+    # The last stored bar is requested again on purpose: prices are split/dividend-adjusted, so if its
+    # Close moved, the whole history was re-adjusted and appending would mix two price scales.
+    new = provider.download([ticker], start=last_date.strftime("%Y-%m-%d"), interval=interval)[ticker]
+    if new.empty:
+        return 0
+    new = storage.clean_prices(new)[0]
+    if last_date in new.index and abs(new.loc[last_date, "Close"] - df.loc[last_date, "Close"]) > 1e-6 * abs(df.loc[last_date, "Close"]):
+        entry = storage.manifest_entry(data_path)
+        first_date = pd.Timestamp(entry["first-date"]) if entry else storage.load_prices(data_path).index[0]
+        new = provider.download([ticker], start=first_date.strftime("%Y-%m-%d"), interval=interval)[ticker]
+        storage.ingest_prices(new, data_path)
+        return int((storage.clean_prices(new)[0].index > last_date).sum())
+
+    new = new[new.index > last_date]
+    if new.empty:
+        return 0
+    storage.append_prices(new, data_path)
+    return len(new)
+
+def ticker_refresh_all(workers=8):
+    # Refresh every stored ticker concurrently (the work is mostly waiting on the network).
+    # Returns {ticker: bars added, or the error message}.
+    results = {}
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = {pool.submit(ticker_refresh, ticker): ticker for ticker in tickerData}
+        for job in futures.as_completed(jobs):
+            try:
+                results[jobs[job]] = job.result()
+            except Exception as e:
+                results[jobs[job]] = str(e)
+    return results
+
+def ticker_charts(output_folder, balance_allocated, settings=None, tickers=None, workers=None, image_format="png"):
+    # Chart images of stored tickers for every setting (or the given (term, risk control) pairs) plus an
+    # index.html, rendered off-screen. Like the batch, the portfolio is left untouched.
+    load_libraries()
+    return render_report(data_folder, output_folder, balance_allocated, settings, tickers, workers, image_format)
@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas
+
+import indicators
+from backtester import crossovers, simulate_signals
+from shared import SharedArrays, attach
+from storage import load_prices
+from sweep import rolling_means
+
+# Walk-forward optimization: the SMA windows and risk-control setting are picked on a training window
+# (the best net change over the grid), then traded on the window right after it, which they've never seen.
+# The windows then roll forward by the test length, and the out-of-sample results are chained into one balance.
+# SMAs are causal, so every window's SMA is computed once over the whole history (one cumulative sum) and
+# every fold reads its slice of it: overlapping training windows share their rolling sums instead of each
+# recomputing them.
+
+def simulate_window(arrays, first, last, short, long, balance_allocated, risk_control):
+    # Backtest days [first, last) with one window pair. The day before `first` serves as the first
+    # yesterday, so a crossover on day `first` itself is seen; nothing is bought on the window's first day,
+    # or before the ticker's day `long` (as in backtest), and a position still open at the end isn't counted.
+    row_of = arrays["meta"]
+    before = max(first - 1, 0)
+    crossUp, crossDown = crossovers(arrays["means"][row_of[short], before:last], arrays["means"][row_of[long], before:last])
+    crossUp, crossDown = crossUp[first - before:], crossDown[first - before:]
+    atr = arrays["atr"][first:last] if risk_control else None
+    return simulate_signals(
+        arrays["close"][first:last], arrays["sa"][first:last], atr, crossUp, crossDown,
+        balance_allocated, risk_control, start=max(long - first, 0)
+    )
+
+def train_worker(job):
+    # Evaluates one chunk of window pairs on one training window, for every risk-control setting.
+    # Returns (fold, best net change, short, long, risk control) for the chunk; ties go to the first in the grid.
+    arrays, fold, first, last, pairs, balance_allocated, risk_controls = job
+    if not isinstance(arrays, dict):
+        arrays = attach(arrays)
+    row_of = arrays["meta"]
+    shortSMAs = arrays["means"][[row_of[short] for short, _ in pairs], max(first - 1, 0):last]
+    longSMAs = arrays["means"][[row_of[long] for _, long in pairs], max(first - 1, 0):last]
+    crossUp, crossDown = crossovers(shortSMAs, longSMAs) # the whole chunk in one 2D pass
+    offset = first - max(first - 1, 0)
+    close, sa = arrays["close"][first:last], arrays["sa"][first:last]
+    best = None
+    for risk_control in risk_controls:
+        atr = arrays["atr"][first:last] if risk_control else None
+        for row, (short, long) in enumerate(pairs):
+            final_balance, _ = simulate_signals(
+                close, sa, atr, crossUp[row, offset:], crossDown[row, offset:],
+                balance_allocated, risk_control, start=max(long - first, 0)
+            )
+            net_change = (final_balance / balance_allocated - 1) * 100
+            if best is None or net_change > best[1]:
+                best = (fold, net_change, short, long, risk_control)
+    return best
+
+def walk_forward(data_path, balance_allocated, shorts, longs, train=504, test=126, risk_controls=(True, False), workers=1, chunk=256):
+    # Rolls a `train`-day training window and the `test` days after it across the history, `test` days at a time.
+    # Returns (stats, DataFrame with one row per fold: the dates, the chosen settings, the in-sample and
+    # out-of-sample net change and the balance carried forward).
+    df = load_prices(data_path)
+    close = df["Close"].to_numpy()
+    if train < 1 or test < 1:
+        raise Exception("INVALID WINDOW LENGTHS")
+    if len(close) < train + test:
+        raise Exception("NOT ENOUGH HISTORY")
+
+    pairs = [(short, long) for short in shorts for long in longs if short < long and long < train]
+    if not pairs:
+        raise Exception("NO VALID WINDOW PAIRS")
+    windows = sorted({window for pair in pairs for window in pair})
+    arrays = {"close": close, "sa": indicators.cache.get(data_path, df, "sa"), "means": rolling_means(close, windows)}
+    if True in risk_controls:
+        arrays["atr"] = indicators.cache.get(data_path, df, "atr")
+    row_of = {window: row for row, window in enumerate(windows)}
+
+    folds = list(range(0, len(close) - train - test + 1, test))
+    chunks = [pairs[i:i + chunk] for i in range(0, len(pairs), chunk)]
+    jobs = [(fold, start, start + train, chunk_pairs) for fold, start in enumerate(folds) for chunk_pairs in chunks]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        arrays["meta"] = row_of
+        results = [train_worker((arrays, *job, balance_allocated, risk_controls)) for job in jobs]
+    else:
+        with SharedArrays(arrays, meta=row_of) as block, ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(train_worker, [(block.handle, *job, balance_allocated, risk_controls) for job in jobs]))
+        arrays["meta"] = row_of
+
+    chosen = {}
+    for result in results: # in grid order, so the first best of the fold wins ties
+        if result[0] not in chosen or result[1] > chosen[result[0]][1]:
+            chosen[result[0]] = result
+
+    rows = []
+    balance = balance_allocated
+    dates = df.index
+    for fold, start in enumerate(folds):
+        _, train_change, short, long, risk_control = chosen[fold]
+        first, last = start + train, start + train + test
+        final_balance, trades = simulate_window(arrays, first, last, short, long, balance, risk_control)
+        rows.append({
+            "train-start": dates[start], "train-end": dates[first - 1],
+            "test-start": dates[first], "test-end": dates[last - 1],
+            "short": short, "long": long, "risk-control": risk_control,
+            "train-net-change": train_change,
+            "test-net-change": (final_balance / balance - 1) * 100,
+            "trades": len(trades),
+            "balance": final_balance
+        })
+        balance = final_balance
+
+    stats = {
+        "balance-allocated": balance_allocated,
+        "final-balance": balance,
+        "net-change": (balance / balance_allocated - 1) * 100,
+        "folds": len(folds),
+        "train-days": train,
+        "test-days": test
+    }
+    return stats, pandas.DataFrame(rows).rename_axis("fold")